@@ -8,7 +8,7 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 from audio_processor.audio_service import EnhancedAudioProcessor
-from music_theory.theory_engine import EnhancedMusicTheoryEngine
+from music_theory.theory_engine import get_theory_engine
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,7 +22,7 @@ class AudioProcessingConsumer(AsyncWebsocketConsumer):
         self.room_group_name = None
         self.user_id = None
         self.audio_processor = EnhancedAudioProcessor()
-        self.theory_engine = EnhancedMusicTheoryEngine()
+        self.theory_engine = get_theory_engine()
     
     async def connect(self):
         """Handle WebSocket connection."""
@@ -342,7 +342,7 @@ class MusicTheoryConsumer(AsyncWebsocketConsumer):
         super().__init__(*args, **kwargs)
         self.room_group_name = None
         self.user_id = None
-        self.theory_engine = EnhancedMusicTheoryEngine()
+        self.theory_engine = get_theory_engine()
     
     async def connect(self):
         """Handle WebSocket connection."""
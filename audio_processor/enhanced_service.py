@@ -12,6 +12,7 @@ from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Any, Callable
 from sklearn.decomposition import NMF, FastICA
 from scipy.signal import stft, istft
+from scipy.fft import rfft, rfftfreq
 import time
 import tempfile
 import threading
@@ -456,18 +457,17 @@ class AudioAnalyzer:
     def analyze_frequency_spectrum(audio: np.ndarray, sr: int) -> Dict[str, Any]:
         """Analyze frequency spectrum characteristics."""
         try:
-            # Compute FFT
-            fft = np.fft.fft(audio)
-            magnitude = np.abs(fft)
-            frequencies = np.fft.fftfreq(len(audio), 1/sr)
-            
-            # Take only positive frequencies
-            positive_freq_idx = frequencies >= 0
-            frequencies = frequencies[positive_freq_idx]
-            magnitude = magnitude[positive_freq_idx]
-            
-            # Find dominant frequencies
-            peaks_idx = np.argsort(magnitude)[-10:]  # Top 10 peaks
+            # Compute the real FFT; it yields the non-negative frequencies
+            # directly instead of a full complex spectrum that is half discarded.
+            # Bins match fftfreq >= 0, so the Nyquist bin of even lengths is dropped
+            n_positive = (len(audio) + 1) // 2
+            magnitude = np.abs(rfft(audio))[:n_positive]
+            frequencies = rfftfreq(len(audio), 1/sr)[:n_positive]
+            
+            # Find dominant frequencies; partition out the top 10 peaks and
+            # order only those rather than sorting the whole spectrum
+            peaks_idx = np.argpartition(magnitude, -10)[-10:] if len(magnitude) > 10 else np.arange(len(magnitude))
+            peaks_idx = peaks_idx[np.argsort(magnitude[peaks_idx])]  # Top 10 peaks
             dominant_frequencies = frequencies[peaks_idx].tolist()
             
             # Frequency band analysis
@@ -2,7 +2,7 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from django.http import JsonResponse, FileResponse
+from django.http import HttpResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.core.files.storage import default_storage
 from django.contrib.auth import get_user_model
@@ -13,6 +13,8 @@ from django.conf import settings
 User = get_user_model()
 import os
 import json
+import shutil
+import threading
 import uuid
 import logging
 from channels.layers import get_channel_layer
@@ -24,6 +26,18 @@ from .task_processor import process_separation_job
 
 logger = logging.getLogger(__name__)
 
+
+def _cleanup_paths(paths):
+    """Remove temporary files and directories, ignoring anything already gone."""
+    for path in paths:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove temporary file {path}: {e}")
+
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -162,6 +176,7 @@ def professional_separate(request):
         # Generate unique filenames
         unique_id = uuid.uuid4().hex
         temp_input = os.path.join(temp_dir, f"input_{unique_id}.wav")
+        spleeter_output_dir = os.path.join(temp_dir, f"spleeter_out_{unique_id}")
         
         # Save uploaded file
         with open(temp_input, 'wb') as f:
@@ -174,14 +189,15 @@ def professional_separate(request):
         y, sr = librosa.load(temp_input, sr=44100, mono=False)
         logger.info(f"Loaded audio: shape={y.shape}, sr={sr}")
         
-        # Handle mono/stereo conversion
+        # Handle mono/stereo conversion. Downstream code only reads the
+        # channels, so a read-only broadcast view avoids copying the signal.
         if y.ndim == 1:
             # Convert mono to stereo by duplicating
-            y = np.stack([y, y])
+            y = np.broadcast_to(y[None, :], (2, y.shape[0]))
             logger.info("Converted mono to stereo")
         elif y.ndim == 2 and y.shape[0] == 1:
             # Single channel stereo to dual channel
-            y = np.repeat(y, 2, axis=0)
+            y = np.broadcast_to(y, (2, y.shape[1]))
             logger.info("Expanded single channel to stereo")
         
         # Use system Spleeter command-line (verified working approach)
@@ -189,11 +205,9 @@ def professional_separate(request):
         
         try:
             import subprocess
-            import shutil
             import glob
             
             # Create output directory for spleeter
-            spleeter_output_dir = os.path.join(temp_dir, f"spleeter_out_{unique_id}")
             os.makedirs(spleeter_output_dir, exist_ok=True)
             
             logger.info("Running Spleeter 4stems separation...")
@@ -295,10 +309,6 @@ def professional_separate(request):
                 logger.error("Other file not found!")
                 raise Exception("Other file not generated by Spleeter")
             
-            # Clean up spleeter output directory
-            shutil.rmtree(spleeter_output_dir, ignore_errors=True)
-            logger.info("Cleaned up Spleeter temporary files")
-            
             logger.info("Spleeter separation completed successfully!")
             
         except subprocess.TimeoutExpired:
@@ -364,79 +374,30 @@ def professional_separate(request):
         
         # Save separated tracks
         results = {}
-        
-        # Save vocals
-        vocals_filename = f"vocals_{unique_id}.wav"
-        vocals_path = os.path.join(separated_dir, vocals_filename)
-        sf.write(vocals_path, vocals_raw, sr)
-        logger.info(f"Saved vocals to: {vocals_path}")
-        
-        # Verify file was created
-        if os.path.exists(vocals_path):
-            file_size = os.path.getsize(vocals_path)
-            logger.info(f"Vocals file created successfully: {file_size} bytes")
-        else:
-            logger.error(f"Failed to create vocals file at: {vocals_path}")
-        
-        # Create URL for vocals
-        vocals_url = f"/media/separated/{vocals_filename}"
-        results['vocals'] = vocals_url
-        
-        # Save drums
-        drums_filename = f"drums_{unique_id}.wav"
-        drums_path = os.path.join(separated_dir, drums_filename)
-        sf.write(drums_path, drums_raw, sr)
-        logger.info(f"Saved drums to: {drums_path}")
-        
-        # Verify file was created
-        if os.path.exists(drums_path):
-            file_size = os.path.getsize(drums_path)
-            logger.info(f"Drums file created successfully: {file_size} bytes")
-        else:
-            logger.error(f"Failed to create drums file at: {drums_path}")
-        
-        # Create URL for drums
-        drums_url = f"/media/separated/{drums_filename}"
-        results['drums'] = drums_url
-        
-        # Save bass
-        bass_filename = f"bass_{unique_id}.wav"
-        bass_path = os.path.join(separated_dir, bass_filename)
-        sf.write(bass_path, bass_raw, sr)
-        logger.info(f"Saved bass to: {bass_path}")
-        
-        # Verify file was created
-        if os.path.exists(bass_path):
-            file_size = os.path.getsize(bass_path)
-            logger.info(f"Bass file created successfully: {file_size} bytes")
-        else:
-            logger.error(f"Failed to create bass file at: {bass_path}")
-        
-        # Create URL for bass
-        bass_url = f"/media/separated/{bass_filename}"
-        results['bass'] = bass_url
-        
-        # Save other
-        other_filename = f"other_{unique_id}.wav"
-        other_path = os.path.join(separated_dir, other_filename)
-        sf.write(other_path, other_raw, sr)
-        logger.info(f"Saved other to: {other_path}")
-        
-        # Verify file was created
-        if os.path.exists(other_path):
-            file_size = os.path.getsize(other_path)
-            logger.info(f"Other file created successfully: {file_size} bytes")
-        else:
-            logger.error(f"Failed to create other file at: {other_path}")
-        
-        # Create URL for other
-        other_url = f"/media/separated/{other_filename}"
-        results['other'] = other_url
-        
-        # Clean up temp input file
-        if os.path.exists(temp_input):
-            os.remove(temp_input)
-            logger.info("Cleaned up temporary input file")
+        stems = (
+            ('vocals', vocals_raw),
+            ('drums', drums_raw),
+            ('bass', bass_raw),
+            ('other', other_raw),
+        )
+
+        for stem_name, stem_audio in stems:
+            stem_filename = f"{stem_name}_{unique_id}.wav"
+            stem_path = os.path.join(separated_dir, stem_filename)
+            sf.write(stem_path, stem_audio, sr)
+
+            # Only stat the written file when debug logging is enabled
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Saved {stem_name} to: {stem_path} ({os.path.getsize(stem_path)} bytes)")
+
+            results[stem_name] = f"/media/separated/{stem_filename}"
+
+        # Clean up temp input and Spleeter output off the request thread
+        threading.Thread(
+            target=_cleanup_paths,
+            args=([spleeter_output_dir, temp_input],),
+            daemon=True
+        ).start()
         
         logger.info(f"Separation completed successfully. Results: {results}")
         
@@ -457,11 +418,13 @@ def professional_separate(request):
 def get_processing_status(request, job_id):
     """Get the status of a processing job."""
     try:
-        job = ProcessingJob.objects.get(id=job_id)
+        job = ProcessingJob.objects.only(
+            'status', 'progress', 'result', 'error_message'
+        ).get(id=job_id)
         return Response({
             'status': job.status,
             'progress': job.progress,
-            'message': job.status_message or '',
+            'message': job.result.get('current_step', ''),
             'error': job.error_message or ''
         })
     except ProcessingJob.DoesNotExist:
@@ -471,7 +434,7 @@ def get_processing_status(request, job_id):
 def get_project_results(request, project_id):
     """Get the results of a completed project."""
     try:
-        project = AudioProject.objects.get(id=project_id)
+        project = AudioProject.objects.only('name').get(id=project_id)
         # Return project results
         return Response({
             'project_name': project.name,
@@ -498,14 +461,16 @@ def cancel_processing(request, job_id):
     except ProcessingJob.DoesNotExist:
         return Response({'error': 'Job not found'}, status=404)
 
-@api_view(['GET'])
+# The health payload never changes, so encode it once at import time
+_HEALTH_BODY = json.dumps({
+    'status': 'healthy',
+    'service': 'NoisyNeuron Audio Processor',
+    'version': '2.0.0'
+}, separators=(',', ':')).encode()
+
 def health_check(request):
     """Health check endpoint."""
-    return JsonResponse({
-        'status': 'healthy',
-        'service': 'NoisyNeuron Audio Processor',
-        'version': '2.0.0'
-    })
+    return HttpResponse(_HEALTH_BODY, content_type='application/json')
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -8,17 +8,152 @@ temporal patterns to model instrument characteristics.
 
 import numpy as np
 import librosa
-import scipy.signal
-from sklearn.cluster import KMeans
+import scipy.ndimage
+import scipy.sparse
+import scipy.special
+from sklearn.cluster import MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
-from collections import defaultdict, Counter
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import json
+import os
 import pickle
+import zlib
 from typing import List, Dict, Tuple, Optional, Any
 import logging
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit when numba is not installed."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
 logger = logging.getLogger(__name__)
 
+
+def extract_audio_features(audio: np.ndarray, sr: int, feature_type: str,
+                           S: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Extract features from audio signal.
+    
+    Module-level so it can be dispatched to worker processes during training.
+    
+    Args:
+        audio: Audio signal
+        sr: Sample rate
+        feature_type: Type of features to extract ('mfcc', 'spectral', 'chroma')
+        S: Optional magnitude spectrogram, np.abs(librosa.stft(audio)) with
+            default parameters, reused instead of computing another STFT
+        
+    Returns:
+        Feature matrix of shape (n_frames, n_features)
+    """
+    if feature_type == 'mfcc':
+        # Extract MFCC features
+        if S is not None:
+            mel = librosa.feature.melspectrogram(S=S ** 2, sr=sr)
+            mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel), sr=sr, n_mfcc=13)
+        else:
+            mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
+        delta_mfccs = librosa.feature.delta(mfccs)
+        delta2_mfccs = librosa.feature.delta(mfccs, order=2)
+        features = np.vstack([mfccs, delta_mfccs, delta2_mfccs])
+        
+    elif feature_type == 'spectral':
+        # Extract spectral features
+        spectral_centroids = librosa.feature.spectral_centroid(y=audio, sr=sr, S=S)
+        spectral_rolloff = librosa.feature.spectral_rolloff(y=audio, sr=sr, S=S)
+        spectral_bandwidth = librosa.feature.spectral_bandwidth(y=audio, sr=sr, S=S)
+        zero_crossing_rate = librosa.feature.zero_crossing_rate(audio)
+        features = np.vstack([spectral_centroids, spectral_rolloff, 
+                            spectral_bandwidth, zero_crossing_rate])
+        
+    elif feature_type == 'chroma':
+        # Extract chroma features
+        chroma = librosa.feature.chroma_stft(
+            y=audio, sr=sr, S=None if S is None else S ** 2
+        )
+        tonnetz = librosa.feature.tonnetz(y=audio, sr=sr)
+        features = np.vstack([chroma, tonnetz])
+        
+    else:
+        raise ValueError(f"Unknown feature type: {feature_type}")
+    
+    return features.T  # Transpose to (n_frames, n_features)
+
+
+@njit(cache=True)
+def _viterbi(log_trans, log_emit, log_init):
+    """
+    Viterbi decoding of a first-order hidden Markov model.
+    
+    Args:
+        log_trans: (n_hidden, n_hidden) log transition probabilities
+        log_emit: (n_frames, n_hidden) per-frame emission log likelihoods
+        log_init: (n_hidden,) log initial state probabilities
+        
+    Returns:
+        Tuple of (most likely hidden state path, (n_frames, n_hidden) log
+        score of the best path ending in each state at each frame)
+    """
+    n_frames, n_hidden = log_emit.shape
+    scores = np.empty((n_frames, n_hidden))
+    backpointers = np.zeros((n_frames, n_hidden), dtype=np.int64)
+    path = np.zeros(n_frames, dtype=np.int64)
+    if n_frames == 0:
+        return path, scores
+    
+    for j in range(n_hidden):
+        scores[0, j] = log_init[j] + log_emit[0, j]
+    
+    for t in range(1, n_frames):
+        for j in range(n_hidden):
+            best_prev = 0
+            best_score = scores[t - 1, 0] + log_trans[0, j]
+            for i in range(1, n_hidden):
+                score = scores[t - 1, i] + log_trans[i, j]
+                if score > best_score:
+                    best_prev = i
+                    best_score = score
+            scores[t, j] = best_score + log_emit[t, j]
+            backpointers[t, j] = best_prev
+    
+    best_last = 0
+    for j in range(1, n_hidden):
+        if scores[n_frames - 1, j] > scores[n_frames - 1, best_last]:
+            best_last = j
+    path[n_frames - 1] = best_last
+    for t in range(n_frames - 1, 0, -1):
+        path[t - 1] = backpointers[t, path[t]]
+    
+    return path, scores
+
+
+def _audio_cache_key(audio: np.ndarray, sr: int) -> Tuple:
+    """
+    Content key for an audio buffer.
+    
+    A CRC-32 of the whole buffer (well under a millisecond per second of
+    audio) means a buffer edited in place, or a new array reusing a freed
+    one's id(), never returns stale features.
+    """
+    return (audio.shape, audio.dtype.str, sr, zlib.crc32(np.ascontiguousarray(audio)))
+
+
+def _cache_put(cache: Dict, key: Tuple, value: Any, max_size: int):
+    """Insert into a small FIFO cache, evicting the oldest entry when full."""
+    if len(cache) >= max_size:
+        cache.pop(next(iter(cache)))
+    cache[key] = value
+
+
 class AudioMarkovChain:
     """
     Markov Chain implementation for audio source separation.
@@ -29,7 +164,18 @@ class AudioMarkovChain:
     - The model helps identify and separate different instruments
     """
     
-    def __init__(self, order: int = 2, n_states: int = 16, feature_type: str = 'mfcc'):
+    # Laplace smoothing applied to transition probabilities when scoring
+    SMOOTHING = 1e-10
+    
+    # Number of recently seen audio buffers whose features are kept
+    FEATURE_CACHE_SIZE = 4
+    
+    # Per-frame probability that the Viterbi mask switches between the
+    # instrument being present and absent
+    MASK_SWITCH_PROB = 0.05
+    
+    def __init__(self, order: int = 2, n_states: int = 16, feature_type: str = 'mfcc',
+                 n_jobs: Optional[int] = 1):
         """
         Initialize the Markov chain.
         
@@ -37,19 +183,31 @@ class AudioMarkovChain:
             order: Order of the Markov chain (memory length)
             n_states: Number of discrete states
             feature_type: Type of features to extract ('mfcc', 'spectral', 'chroma')
+            n_jobs: Worker processes used for feature extraction during
+                training (None for one per CPU). Keep the default of 1 inside
+                daemonic workers such as Celery's prefork pool, which cannot
+                spawn child processes.
         """
         self.order = order
         self.n_states = n_states
         self.feature_type = feature_type
+        self.n_jobs = n_jobs
         
-        # Markov chain components
-        self.transition_matrix = np.zeros((n_states ** order, n_states))
+        # Markov chain components. Most histories are never observed for
+        # higher orders, so transitions are stored sparse (CSR).
+        self.transition_matrix = scipy.sparse.csr_matrix((n_states ** order, n_states))
         self.state_counts = np.zeros(n_states ** order)
         self.emission_matrix = None
         
+        # Scoring tables precomputed after training: smoothed log transition
+        # probabilities and the mean transition probability of each history
+        self.log_unseen = None
+        self.log_transition_gain = None
+        self.row_means = None
+        
         # Feature extraction
         self.scaler = StandardScaler()
-        self.kmeans = KMeans(n_clusters=n_states, random_state=42)
+        self.kmeans = MiniBatchKMeans(n_clusters=n_states, batch_size=4096, n_init=3, random_state=42)
         
         # State mapping
         self.state_mapping = {}
@@ -58,44 +216,29 @@ class AudioMarkovChain:
         # Training status
         self.is_trained = False
         self.training_samples = 0
+        
+        # Recently extracted features, keyed by _audio_cache_key
+        self._feature_cache = {}
     
-    def extract_features(self, audio: np.ndarray, sr: int) -> np.ndarray:
+    def extract_features(self, audio: np.ndarray, sr: int,
+                         S: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Extract features from audio signal.
         
         Args:
             audio: Audio signal
             sr: Sample rate
+            S: Optional precomputed magnitude spectrogram of the audio
             
         Returns:
             Feature matrix of shape (n_frames, n_features)
         """
-        if self.feature_type == 'mfcc':
-            # Extract MFCC features
-            mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
-            delta_mfccs = librosa.feature.delta(mfccs)
-            delta2_mfccs = librosa.feature.delta(mfccs, order=2)
-            features = np.vstack([mfccs, delta_mfccs, delta2_mfccs])
-            
-        elif self.feature_type == 'spectral':
-            # Extract spectral features
-            spectral_centroids = librosa.feature.spectral_centroid(y=audio, sr=sr)
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=audio, sr=sr)
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(y=audio, sr=sr)
-            zero_crossing_rate = librosa.feature.zero_crossing_rate(audio)
-            features = np.vstack([spectral_centroids, spectral_rolloff, 
-                                spectral_bandwidth, zero_crossing_rate])
-            
-        elif self.feature_type == 'chroma':
-            # Extract chroma features
-            chroma = librosa.feature.chroma_stft(y=audio, sr=sr)
-            tonnetz = librosa.feature.tonnetz(y=audio, sr=sr)
-            features = np.vstack([chroma, tonnetz])
-            
-        else:
-            raise ValueError(f"Unknown feature type: {self.feature_type}")
-        
-        return features.T  # Transpose to (n_frames, n_features)
+        key = _audio_cache_key(audio, sr)
+        features = self._feature_cache.get(key)
+        if features is None:
+            features = extract_audio_features(audio, sr, self.feature_type, S)
+            _cache_put(self._feature_cache, key, features, self.FEATURE_CACHE_SIZE)
+        return features
     
     def _quantize_features(self, features: np.ndarray) -> np.ndarray:
         """
@@ -105,7 +248,7 @@ class AudioMarkovChain:
             features: Feature matrix
             
         Returns:
-            State sequence
+            State sequence as uint8 (uint16 above 256 states)
         """
         if not self.is_trained:
             # First time: fit the scaler and k-means
@@ -116,7 +259,9 @@ class AudioMarkovChain:
             normalized_features = self.scaler.transform(features)
             states = self.kmeans.predict(normalized_features)
         
-        return states
+        # Labels fit in a byte for the usual state counts, which keeps the
+        # sequences 8x smaller than sklearn's int64 labels
+        return states.astype(np.uint8 if self.n_states <= 256 else np.uint16, copy=False)
     
     def _build_transition_matrix(self, state_sequence: np.ndarray):
         """
@@ -125,25 +270,69 @@ class AudioMarkovChain:
         Args:
             state_sequence: Sequence of states
         """
-        n_frames = len(state_sequence)
+        history_idx = self._history_indices(state_sequence)
+        if len(history_idx) == 0:
+            return
+        
+        next_states = state_sequence[self.order:]
+        
+        # COO -> CSR conversion sums the repeated (history, next_state) pairs
+        counts = scipy.sparse.coo_matrix(
+            (np.ones(len(history_idx)), (history_idx, next_states)),
+            shape=self.transition_matrix.shape
+        ).tocsr()
+        self.transition_matrix = self.transition_matrix + counts
+        self.state_counts += np.bincount(history_idx, minlength=len(self.state_counts))
+    
+    def _history_indices(self, state_sequence: np.ndarray) -> np.ndarray:
+        """
+        Compute the history index for every frame that has a full history.
         
-        for i in range(self.order, n_frames):
-            # Get current state and history
-            current_state = state_sequence[i]
-            history = tuple(state_sequence[i-self.order:i])
-            
-            # Convert history tuple to index
-            history_idx = self._history_to_index(history)
+        Equivalent to calling _history_to_index on each window
+        state_sequence[i-order:i] for i in range(order, len(state_sequence)).
+        The index is built like a rolling hash, h = h * n_states + state, one
+        shifted slice at a time, so no per-frame window is materialized.
+        
+        Args:
+            state_sequence: Sequence of states
             
-            # Update transition counts
-            self.transition_matrix[history_idx, current_state] += 1
-            self.state_counts[history_idx] += 1
+        Returns:
+            Integer array of length max(len(state_sequence) - order, 0)
+        """
+        state_sequence = np.asarray(state_sequence)
+        n_windows = len(state_sequence) - self.order
+        if n_windows <= 0:
+            return np.empty(0, dtype=np.int64)
+        
+        history_idx = state_sequence[:n_windows].astype(np.int64)
+        for offset in range(1, self.order):
+            history_idx *= self.n_states
+            history_idx += state_sequence[offset:offset + n_windows]
+        return history_idx
+    
+    def _compute_log_transitions(self):
+        """
+        Precompute Laplace-smoothed log transition probabilities for scoring.
+        
+        The smoothed log probability of (history, state) is split into a dense
+        per-history base for unseen transitions, log_unseen, plus a sparse
+        gain log1p(p / SMOOTHING) that is nonzero only for observed
+        transitions, so the CSR structure of the transition matrix is kept.
+        The per-history row means used by 'mean' masks are stored alongside.
+        """
+        denominators = self.state_counts + self.SMOOTHING * self.n_states
+        self.log_unseen = np.log(self.SMOOTHING / denominators)
+        
+        self.log_transition_gain = self.transition_matrix.copy()
+        self.log_transition_gain.data = np.log1p(self.transition_matrix.data / self.SMOOTHING)
+        
+        self.row_means = np.asarray(self.transition_matrix.mean(axis=1)).ravel()
     
     def _history_to_index(self, history: Tuple) -> int:
         """Convert state history to matrix index."""
         index = 0
-        for i, state in enumerate(history):
-            index += state * (self.n_states ** (self.order - 1 - i))
+        for state in history:
+            index = index * self.n_states + int(state)
         return index
     
     def _index_to_history(self, index: int) -> Tuple:
@@ -165,36 +354,49 @@ class AudioMarkovChain:
         logger.info(f"Training Markov chain for {instrument_type} with {len(audio_files)} files")
         
         all_features = []
-        all_states = []
         
-        # Extract features from all files
-        for audio, sr in audio_files:
-            features = self.extract_features(audio, sr)
-            all_features.append(features)
-        
-        # Concatenate all features for clustering
+        # Extract features from all files (in parallel when n_jobs allows)
+        n_jobs = self.n_jobs or os.cpu_count() or 1
+        if n_jobs > 1 and len(audio_files) > 1:
+            audios, sample_rates = zip(*audio_files)
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(audio_files))) as executor:
+                all_features = list(executor.map(
+                    extract_audio_features, audios, sample_rates,
+                    repeat(self.feature_type)
+                ))
+        else:
+            for audio, sr in audio_files:
+                features = self.extract_features(audio, sr)
+                all_features.append(features)
+        
+        # Quantize all frames in one pass so the scaler and k-means are fit
+        # once and every file shares the same states, then split the labels
+        # back into per-file sequences. The per-file features and the
+        # concatenated copy are released as soon as they are consumed.
+        file_lengths = [len(features) for features in all_features]
         combined_features = np.vstack(all_features)
-        
-        # Quantize features into states
-        all_state_sequences = []
-        for features in all_features:
-            states = self._quantize_features(features)
-            all_state_sequences.append(states)
-            all_states.extend(states)
+        del all_features
+        total_frames = len(combined_features)
+        combined_states = self._quantize_features(combined_features)
+        del combined_features
+        all_state_sequences = np.split(combined_states, np.cumsum(file_lengths)[:-1])
         
         # Build transition matrix
         for state_sequence in all_state_sequences:
             self._build_transition_matrix(state_sequence)
         
-        # Normalize transition matrix
-        for i in range(len(self.transition_matrix)):
-            if self.state_counts[i] > 0:
-                self.transition_matrix[i] /= self.state_counts[i]
+        # Normalize transition matrix rows by their observation counts in a
+        # single broadcasted divide over the stored entries. Every stored
+        # entry belongs to an observed history, so no zero-count guard is needed.
+        row_nnz = np.diff(self.transition_matrix.indptr)
+        self.transition_matrix.data /= np.repeat(self.state_counts, row_nnz)
+        
+        self._compute_log_transitions()
         
         self.is_trained = True
         self.training_samples = len(audio_files)
         
-        logger.info(f"Training completed. Processed {len(combined_features)} frames.")
+        logger.info(f"Training completed. Processed {total_frames} frames.")
     
     def predict_probability(self, audio: np.ndarray, sr: int) -> float:
         """
@@ -213,23 +415,18 @@ class AudioMarkovChain:
         features = self.extract_features(audio, sr)
         states = self._quantize_features(features)
         
-        log_prob = 0.0
-        smoothing = 1e-10  # Laplace smoothing
+        history_idx = self._history_indices(states)
+        if len(history_idx) == 0:
+            return 0.0
+        next_states = states[self.order:]
         
-        for i in range(self.order, len(states)):
-            history = tuple(states[i-self.order:i])
-            current_state = states[i]
-            history_idx = self._history_to_index(history)
-            
-            # Get transition probability with smoothing
-            prob = (self.transition_matrix[history_idx, current_state] + smoothing) / \
-                   (self.state_counts[history_idx] + smoothing * self.n_states)
-            
-            log_prob += np.log(prob)
+        log_prob = self.log_unseen[history_idx].sum() + \
+                   self.log_transition_gain[history_idx, next_states].sum()
         
-        return log_prob
+        return float(log_prob)
     
-    def generate_mask(self, audio: np.ndarray, sr: int, threshold: float = 0.5) -> np.ndarray:
+    def generate_mask(self, audio: np.ndarray, sr: int, threshold: float = 0.5,
+                      method: str = 'viterbi') -> np.ndarray:
         """
         Generate a separation mask based on Markov model predictions.
         
@@ -237,52 +434,110 @@ class AudioMarkovChain:
             audio: Audio signal
             sr: Sample rate
             threshold: Threshold for mask generation
+            method: Frame scoring method ('viterbi', 'mean'); see
+                generate_mask_from_states
             
         Returns:
-            Binary mask for source separation
+            Binary per-frame mask of length n_frames of librosa.stft(audio);
+            broadcast it against the (n_freq_bins, n_frames) spectrogram
         """
         if not self.is_trained:
             raise ValueError("Model must be trained before mask generation")
         
-        # Compute STFT
-        stft = librosa.stft(audio)
-        magnitude = np.abs(stft)
+        # Number of frames librosa.stft produces with its default centered
+        # framing (hop_length=512); the mask does not need the STFT itself
+        n_stft_frames = 1 + len(audio) // 512
         
         # Extract features frame by frame
         features = self.extract_features(audio, sr)
         states = self._quantize_features(features)
         
-        # Calculate frame-wise probabilities
-        frame_probs = []
-        for i in range(self.order, len(states)):
-            history = tuple(states[i-self.order:i])
-            history_idx = self._history_to_index(history)
+        return self.generate_mask_from_states(states, n_stft_frames, threshold, method)
+    
+    def generate_mask_from_states(self, states: np.ndarray, n_stft_frames: int,
+                                  threshold: float = 0.5,
+                                  method: str = 'viterbi') -> np.ndarray:
+        """
+        Generate a separation mask from an already quantized state sequence.
+        
+        Lets callers that separate several instruments from the same audio
+        compute the STFT and features once instead of once per model.
+        
+        Args:
+            states: State sequence from _quantize_features
+            n_stft_frames: Number of frames of the STFT the mask applies to
+            threshold: Threshold for mask generation
+            method: 'viterbi' decodes a two-state present/absent HMM whose
+                emissions are this model's transition likelihoods against a
+                uniform background; 'mean' uses the mean transition
+                probability of each frame's history
             
-            # Average probability across all possible next states
-            prob = np.mean(self.transition_matrix[history_idx])
-            frame_probs.append(prob)
+        Returns:
+            Binary per-frame mask of length n_stft_frames; broadcast it
+            against the spectrogram as mask[None, :]
+        """
+        if not self.is_trained:
+            raise ValueError("Model must be trained before mask generation")
+        
+        if method == 'viterbi':
+            frame_probs = self._viterbi_frame_probs(states)
+        elif method == 'mean':
+            # Frame-wise probabilities (average probability across all
+            # possible next states for each frame's history), gathered from
+            # the row means precomputed after training
+            frame_probs = self.row_means[self._history_indices(states)]
+        else:
+            raise ValueError(f"Unknown mask method: {method}")
         
         # Pad probabilities to match STFT frames
-        frame_probs = np.array(frame_probs)
-        if len(frame_probs) < magnitude.shape[1]:
+        if len(frame_probs) < n_stft_frames:
             # Pad with mean probability
-            padding = np.full(magnitude.shape[1] - len(frame_probs), np.mean(frame_probs))
+            padding = np.full(n_stft_frames - len(frame_probs), np.mean(frame_probs))
             frame_probs = np.concatenate([frame_probs, padding])
-        elif len(frame_probs) > magnitude.shape[1]:
+        elif len(frame_probs) > n_stft_frames:
             # Truncate
-            frame_probs = frame_probs[:magnitude.shape[1]]
+            frame_probs = frame_probs[:n_stft_frames]
         
         # Create mask
         mask = (frame_probs > threshold).astype(float)
         
         # Apply smoothing to mask
-        mask = scipy.signal.medfilt(mask, kernel_size=5)
-        
-        # Expand mask to frequency dimension
-        mask = np.tile(mask, (magnitude.shape[0], 1))
+        mask = scipy.ndimage.median_filter(mask, size=5, mode='nearest')
         
         return mask
     
+    def _viterbi_frame_probs(self, states: np.ndarray) -> np.ndarray:
+        """
+        Per-frame probability that the modeled instrument is present.
+        
+        A two-state HMM (absent, present) with sticky transitions is decoded
+        with Viterbi. The present state emits each frame's transition under
+        this model, the absent state emits it uniformly. The best-path scores
+        of the two states at every frame are turned into a probability with
+        a logistic, so 0.5 is where both hypotheses score equally.
+        
+        Args:
+            states: State sequence from _quantize_features
+            
+        Returns:
+            Array of length max(len(states) - order, 0)
+        """
+        history_idx = self._history_indices(states)
+        transition_probs = np.asarray(
+            self.transition_matrix[history_idx, states[self.order:]]
+        ).ravel() if len(history_idx) else np.empty(0)
+        
+        log_emit = np.empty((len(history_idx), 2))
+        log_emit[:, 0] = -np.log(self.n_states)
+        log_emit[:, 1] = np.log(transition_probs + self.SMOOTHING)
+        
+        stay, switch = np.log(1.0 - self.MASK_SWITCH_PROB), np.log(self.MASK_SWITCH_PROB)
+        log_trans = np.array([[stay, switch], [switch, stay]])
+        log_init = np.full(2, np.log(0.5))
+        
+        _, scores = _viterbi(log_trans, log_emit, log_init)
+        return scipy.special.expit(scores[:, 1] - scores[:, 0])
+    
     def analyze_patterns(self, audio: np.ndarray, sr: int) -> Dict[str, Any]:
         """
         Analyze patterns in the audio using the Markov model.
@@ -298,20 +553,19 @@ class AudioMarkovChain:
         states = self._quantize_features(features)
         
         # Calculate pattern statistics
-        state_distribution = Counter(states)
-        entropy = -sum(p * np.log2(p) for p in 
-                      [count/len(states) for count in state_distribution.values()])
-        
-        # Calculate transition entropy
-        transition_entropy = 0.0
-        for i in range(self.order, len(states)):
-            history = tuple(states[i-self.order:i])
-            history_idx = self._history_to_index(history)
-            
-            if self.state_counts[history_idx] > 0:
-                probs = self.transition_matrix[history_idx]
-                probs = probs[probs > 0]  # Remove zero probabilities
-                transition_entropy -= np.sum(probs * np.log2(probs))
+        state_counts = np.bincount(states, minlength=self.n_states)
+        state_probs = state_counts / len(states)
+        entropy = -scipy.special.xlogy(state_probs, state_probs).sum() / np.log(2)
+        observed_states = np.flatnonzero(state_counts)
+        state_distribution = {int(state): int(state_counts[state]) for state in observed_states}
+        
+        # Calculate transition entropy: per-history entropies over the stored
+        # CSR entries, gathered at every frame's history
+        transitions = self.transition_matrix
+        row_ids = np.repeat(np.arange(transitions.shape[0]), np.diff(transitions.indptr))
+        plogp = scipy.special.xlogy(transitions.data, transitions.data) / np.log(2)
+        row_entropy = -np.bincount(row_ids, weights=plogp, minlength=transitions.shape[0])
+        transition_entropy = float(row_entropy[self._history_indices(states)].sum())
         
         # Calculate complexity and predictability
         complexity = entropy / np.log2(self.n_states)  # Normalized entropy
@@ -328,22 +582,39 @@ class AudioMarkovChain:
         }
     
     def save_model(self, filepath: str):
-        """Save the trained model to disk."""
+        """
+        Save the trained model to disk.
+        
+        Scalar metadata goes to a small JSON file at `filepath`; the arrays
+        are written in binary form to a compressed .npz file alongside it.
+        """
         model_data = {
             'order': self.order,
             'n_states': self.n_states,
             'feature_type': self.feature_type,
-            'transition_matrix': self.transition_matrix.tolist(),
-            'state_counts': self.state_counts.tolist(),
             'is_trained': self.is_trained,
             'training_samples': self.training_samples,
-            'scaler_mean': self.scaler.mean_.tolist() if hasattr(self.scaler, 'mean_') else None,
-            'scaler_scale': self.scaler.scale_.tolist() if hasattr(self.scaler, 'scale_') else None,
-            'kmeans_centers': self.kmeans.cluster_centers_.tolist() if hasattr(self.kmeans, 'cluster_centers_') else None
+            'arrays_file': os.path.basename(self._arrays_path(filepath))
+        }
+        
+        transitions = self.transition_matrix
+        arrays = {
+            'transition_data': transitions.data,
+            'transition_indices': transitions.indices,
+            'transition_indptr': transitions.indptr,
+            'transition_shape': np.array(transitions.shape),
+            'state_counts': self.state_counts
         }
+        if hasattr(self.scaler, 'mean_') and hasattr(self.scaler, 'scale_'):
+            arrays['scaler_mean'] = self.scaler.mean_
+            arrays['scaler_scale'] = self.scaler.scale_
+        if hasattr(self.kmeans, 'cluster_centers_'):
+            arrays['kmeans_centers'] = self.kmeans.cluster_centers_
         
         with open(filepath, 'w') as f:
             json.dump(model_data, f, indent=2)
+        
+        np.savez_compressed(self._arrays_path(filepath), **arrays)
     
     def load_model(self, filepath: str):
         """Load a trained model from disk."""
@@ -353,27 +624,55 @@ class AudioMarkovChain:
         self.order = model_data['order']
         self.n_states = model_data['n_states']
         self.feature_type = model_data['feature_type']
-        self.transition_matrix = np.array(model_data['transition_matrix'])
-        self.state_counts = np.array(model_data['state_counts'])
+        self._feature_cache.clear()
         self.is_trained = model_data['is_trained']
         self.training_samples = model_data['training_samples']
         
+        if 'transition_matrix' in model_data:
+            # Models saved before binary storage embed everything as JSON lists
+            arrays = {
+                key: np.array(model_data[key])
+                for key in ('state_counts', 'scaler_mean', 'scaler_scale', 'kmeans_centers')
+                if model_data.get(key)
+            }
+            self.transition_matrix = scipy.sparse.csr_matrix(np.array(model_data['transition_matrix']))
+        else:
+            with np.load(self._arrays_path(filepath), allow_pickle=False) as npz:
+                arrays = dict(npz)
+            self.transition_matrix = scipy.sparse.csr_matrix(
+                (arrays['transition_data'], arrays['transition_indices'], arrays['transition_indptr']),
+                shape=tuple(arrays['transition_shape'])
+            )
+        
+        self.state_counts = arrays['state_counts']
+        
         # Restore scaler
-        if model_data.get('scaler_mean') and model_data.get('scaler_scale'):
-            self.scaler.mean_ = np.array(model_data['scaler_mean'])
-            self.scaler.scale_ = np.array(model_data['scaler_scale'])
+        if 'scaler_mean' in arrays and 'scaler_scale' in arrays:
+            self.scaler.mean_ = arrays['scaler_mean']
+            self.scaler.scale_ = arrays['scaler_scale']
         
         # Restore k-means
-        if model_data.get('kmeans_centers'):
-            self.kmeans.cluster_centers_ = np.array(model_data['kmeans_centers'])
+        if 'kmeans_centers' in arrays:
+            self.kmeans.cluster_centers_ = arrays['kmeans_centers']
+        
+        self._compute_log_transitions()
+    
+    @staticmethod
+    def _arrays_path(filepath: str) -> str:
+        """Path of the .npz array store kept alongside a model's JSON metadata."""
+        return f"{os.path.splitext(filepath)[0]}.npz"
 
 class AudioSourceSeparator:
     """
     Audio source separation using multiple Markov chains.
     """
     
+    # Number of recently seen audio buffers whose STFT is kept
+    STFT_CACHE_SIZE = 4
+    
     def __init__(self):
         self.models = {}  # instrument_type -> AudioMarkovChain
+        self._stft_cache = {}  # _audio_cache_key -> stft
     
     def add_model(self, instrument_type: str, model: AudioMarkovChain):
         """Add a trained model for an instrument type."""
@@ -395,13 +694,20 @@ class AudioSourceSeparator:
         if target_instruments is None:
             target_instruments = list(self.models.keys())
         
-        # Compute STFT
-        stft = librosa.stft(audio)
-        magnitude = np.abs(stft)
-        phase = np.angle(stft)
+        # Compute STFT, reusing it when the same audio is separated again
+        key = _audio_cache_key(audio, sr)
+        if key not in self._stft_cache:
+            _cache_put(self._stft_cache, key, librosa.stft(audio), self.STFT_CACHE_SIZE)
+        stft = self._stft_cache[key]
         
         separated_audio = {}
         
+        # Features depend only on the feature type, so models sharing a
+        # feature type reuse one extraction, and all of them are computed
+        # from this STFT's magnitude instead of a fresh STFT
+        features_by_type = {}
+        magnitude = None
+        
         for instrument in target_instruments:
             if instrument not in self.models:
                 logger.warning(f"No model available for {instrument}")
@@ -409,14 +715,23 @@ class AudioSourceSeparator:
             
             model = self.models[instrument]
             
+            if model.feature_type not in features_by_type:
+                if magnitude is None:
+                    magnitude = np.abs(stft)
+                features_by_type[model.feature_type] = model.extract_features(
+                    audio, sr, S=magnitude
+                )
+            states = model._quantize_features(features_by_type[model.feature_type])
+            
             # Generate separation mask
-            mask = model.generate_mask(audio, sr)
+            mask = model.generate_mask_from_states(states, stft.shape[1])
             
-            # Apply mask to magnitude spectrogram
-            separated_magnitude = magnitude * mask
+            # Apply the real-valued mask to the complex STFT directly,
+            # broadcasting over frequency; this scales the magnitude and
+            # keeps the phase without an angle/exp round trip
+            separated_stft = stft * mask[None, :]
             
             # Reconstruct audio
-            separated_stft = separated_magnitude * np.exp(1j * phase)
             separated_audio[instrument] = librosa.istft(separated_stft)
         
         return separated_audio
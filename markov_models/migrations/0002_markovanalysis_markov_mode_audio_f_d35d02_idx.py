@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-16 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('markov_models', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='markovanalysis',
+            index=models.Index(fields=['audio_file', 'created_at'], name='markov_mode_audio_f_d35d02_idx'),
+        ),
+    ]
@@ -125,6 +125,11 @@ class MarkovAnalysis(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['audio_file', 'created_at']),
+        ]
+    
     def __str__(self):
         track_info = f" - {self.separated_track.track_type}" if self.separated_track else ""
         return f"Markov Analysis: {self.audio_file.original_filename}{track_info}"
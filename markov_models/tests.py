@@ -1,3 +1,18 @@
-from django.test import TestCase
+import numpy as np
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .markov_chain import AudioMarkovChain
+
+
+class AudioMarkovChainTests(SimpleTestCase):
+    def test_train_then_generate_mask(self):
+        sr = 22050
+        rng = np.random.default_rng(0)
+        audio_files = [(rng.standard_normal(sr).astype(np.float32), sr) for _ in range(2)]
+
+        model = AudioMarkovChain(order=1, n_states=4, n_jobs=1)
+        model.train(audio_files, 'test')
+        mask = model.generate_mask(audio_files[0][0], sr)
+
+        self.assertEqual(len(mask), 1 + sr // 512)
+        self.assertTrue(np.all(np.isfinite(mask)))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-16 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_theory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='practice',
+            index=models.Index(fields=['user', 'created_at'], name='music_theor_user_id_05ac68_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprogress',
+            index=models.Index(fields=['user', 'last_practiced'], name='music_theor_user_id_8e481c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprogress',
+            index=models.Index(fields=['instrument', 'skill_level'], name='music_theor_instrum_d1c39b_idx'),
+        ),
+    ]
@@ -84,6 +84,10 @@ class UserProgress(models.Model):
     
     class Meta:
         unique_together = ['user', 'instrument', 'song', 'chord']
+        indexes = [
+            models.Index(fields=['user', 'last_practiced']),
+            models.Index(fields=['instrument', 'skill_level']),
+        ]
 
 
 class LearningPath(models.Model):
@@ -125,5 +129,10 @@ class Practice(models.Model):
     recorded_audio = models.FileField(upload_to='practice_recordings/', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+    
     def __str__(self):
         return f"{self.user.username} practiced {self.song or self.chord} on {self.instrument.name}"
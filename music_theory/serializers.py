@@ -38,6 +38,11 @@ class SongSerializer(serializers.ModelSerializer):
     class Meta:
         model = Song
         fields = '__all__'
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the nested chord progression; call from the view's queryset."""
+        return queryset.select_related('chord_progression')
 
 
 class UserProgressSerializer(serializers.ModelSerializer):
@@ -48,6 +53,11 @@ class UserProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProgress
         fields = '__all__'
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the nested instrument, song and chord; call from the view's queryset."""
+        return queryset.select_related('instrument', 'song__chord_progression', 'chord')
 
 
 class LearningPathSerializer(serializers.ModelSerializer):
@@ -58,6 +68,13 @@ class LearningPathSerializer(serializers.ModelSerializer):
     class Meta:
         model = LearningPath
         fields = '__all__'
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Fetch the nested instrument, songs and chords; call from the view's queryset."""
+        return queryset.select_related('instrument').prefetch_related(
+            'songs__chord_progression', 'chords'
+        )
 
 
 class PracticeSerializer(serializers.ModelSerializer):
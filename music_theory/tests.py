@@ -0,0 +1,66 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from .theory_engine import EnhancedMusicTheoryEngine
+
+
+def _correlations(rows: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Float64 Pearson correlation of every row with every column of vectors."""
+    rows = rows - rows.mean(axis=1, keepdims=True)
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+    vectors = vectors - vectors.mean(axis=0)
+    vectors /= np.linalg.norm(vectors, axis=0)
+    return rows @ vectors
+
+
+class Float32DetectionTests(SimpleTestCase):
+    """Key and chord detection in float32 against a float64 reference."""
+
+    def setUp(self):
+        self.engine = EnhancedMusicTheoryEngine()
+        self.rng = np.random.default_rng(0)
+
+        cls = EnhancedMusicTheoryEngine
+        self.key_profiles = np.array(
+            list(cls.KEY_PROFILES.values()) + list(cls.MINOR_KEY_PROFILES.values()),
+            dtype=np.float64
+        )
+        self.key_names = list(cls.KEY_PROFILES) + list(cls.MINOR_KEY_PROFILES)
+        self.n_major = len(cls.KEY_PROFILES)
+
+        templates = []
+        self.chord_names = []
+        for root_idx, root in enumerate(cls.NOTES):
+            for quality, intervals in cls.CHORD_TEMPLATES.items():
+                template = np.zeros(12)
+                template[(np.array(intervals) + root_idx) % 12] = 1
+                templates.append(template)
+                self.chord_names.append(f"{root}{quality if quality != 'major' else ''}")
+        self.templates = np.array(templates)
+
+    def test_key_detection_matches_float64(self):
+        for _ in range(20):
+            chroma = self.rng.random((12, 100))
+            correlations = _correlations(self.key_profiles, chroma.mean(axis=1)[:, None])[:, 0]
+            major = int(np.argmax(correlations[:self.n_major]))
+            minor = self.n_major + int(np.argmax(correlations[self.n_major:]))
+            best = major if correlations[major] > correlations[minor] else minor
+
+            analysis = self.engine._enhanced_key_detection(chroma.astype(np.float32))
+
+            self.assertEqual(analysis.key, self.key_names[best])
+            self.assertAlmostEqual(analysis.confidence, correlations[best], delta=1e-4)
+
+    def test_chord_detection_matches_float64(self):
+        chroma = self.rng.random((12, 200))
+        correlations = _correlations(self.templates, chroma)
+        expected = correlations.argmax(axis=0)
+
+        best_ids = self.engine._best_chord_ids(chroma.astype(np.float32))
+        self.assertEqual([self.chord_names[i] for i in best_ids],
+                         [self.chord_names[i] for i in expected])
+
+        for column, best in enumerate(expected):
+            chord = self.engine._detect_chord_from_chroma(chroma[:, column].astype(np.float32))
+            self.assertEqual(chord['chord'], self.chord_names[best])
+            self.assertAlmostEqual(chord['confidence'], correlations[best, column], delta=1e-4)
@@ -1,13 +1,208 @@
 import numpy as np
 import librosa
+import soundfile as sf
+from scipy.ndimage import median_filter
+from scipy.fft import next_fast_len
 from typing import List, Dict, Tuple, Optional, Any
+import copy
 import json
+import math
+import os
+import re
+import tempfile
+import functools
 from dataclasses import dataclass
 from enum import Enum
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit when numba is not installed."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
 logger = logging.getLogger(__name__)
 
+# Chord name split into a natural or sharp root and the remaining chord type
+_CHORD_RE = re.compile(r'^([A-G]#?)(.*)$')
+
+# Spellings of plain major and minor chord types (compared lowercased)
+_CHORD_TYPE_ALIASES = {'': 'major', 'maj': 'major', 'm': 'minor', 'min': 'minor'}
+
+# Extended or altered chord qualities, scored as harmonic complexity
+_COMPLEX_CHORD_RE = re.compile(r'7|9|11|13|dim|aug')
+
+# Chord colours that push the mood towards 'sophisticated'
+_COLORFUL_CHORD_RE = re.compile(r'7|9|dim')
+
+# Key profiles for C major and C minor, one weight per pitch class from C
+_MAJOR_KEY_PROFILE = np.array(
+    [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88],
+    dtype=np.float32
+)
+_MINOR_KEY_PROFILE = np.array(
+    [6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17],
+    dtype=np.float32
+)
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _score_chords(chroma_segments, templates_unit, out_ids):
+    """
+    Write the best-correlated chord template for every chroma segment.
+    
+    Templates are zero-mean and unit-norm, so the segment's own norm scales
+    every score equally and the argmax only needs the centered dot products.
+    Centering and the argmax are fused into one pass per segment.
+    
+    Args:
+        chroma_segments: (12, n_segments) averaged chroma
+        templates_unit: (n_chords, 12) zero-mean, unit-norm chord templates
+        out_ids: (n_segments,) output buffer of best template rows
+    """
+    n_chords = templates_unit.shape[0]
+    centered = np.empty(12)
+    for j in range(chroma_segments.shape[1]):
+        mean = 0.0
+        for p in range(12):
+            mean += chroma_segments[p, j]
+        mean /= 12
+        for p in range(12):
+            centered[p] = chroma_segments[p, j] - mean
+        
+        best_id = 0
+        best_dot = -np.inf
+        for k in range(n_chords):
+            dot = 0.0
+            for p in range(12):
+                dot += templates_unit[k, p] * centered[p]
+            if dot > best_dot:
+                best_dot = dot
+                best_id = k
+        out_ids[j] = best_id
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _corr_argmax(x, templates_unit):
+    """
+    Best Pearson correlation of one vector against unit template rows.
+    
+    Centering, the norm, the dot products and the argmax are fused into
+    one loop, which beats a BLAS call on 12-wide inputs.
+    
+    Args:
+        x: (n,) vector to match
+        templates_unit: (n_templates, n) zero-mean, unit-norm templates
+        
+    Returns:
+        (best row, correlation); (0, 0.0) for a constant vector
+    """
+    n = x.shape[0]
+    mean = 0.0
+    for p in range(n):
+        mean += x[p]
+    mean /= n
+    norm = 0.0
+    for p in range(n):
+        norm += (x[p] - mean) * (x[p] - mean)
+    if norm == 0.0:
+        return 0, 0.0
+    norm = np.sqrt(norm)
+    
+    best_id = 0
+    best_dot = -np.inf
+    for k in range(templates_unit.shape[0]):
+        dot = 0.0
+        for p in range(n):
+            dot += templates_unit[k, p] * (x[p] - mean)
+        if dot > best_dot:
+            best_dot = dot
+            best_id = k
+    return best_id, best_dot / norm
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _autocorr_peak(corr):
+    """
+    Return the lag of the autocorrelation peak past the zero-lag lobe.
+    
+    One pass finds where the sequence first starts rising (the first index
+    of np.diff(corr) > 0, or 1 when it never rises) and then keeps the
+    first maximum from there on, matching np.argmax(corr[start:]) + start
+    without the difference array or the slice.
+    """
+    n = len(corr)
+    start = 1
+    for i in range(1, n):
+        if corr[i] > corr[i - 1]:
+            start = i - 1
+            break
+    peak = start
+    if peak >= n:
+        return 0
+    for i in range(start + 1, n):
+        if corr[i] > corr[peak]:
+            peak = i
+    return peak
+
+
+@njit(cache=True)
+def _parabolic_lag(corr, peak):
+    """
+    Refine an integer autocorrelation peak to a fractional lag.
+    
+    Fits a parabola through the peak and its two neighbours and returns the
+    lag of its vertex; edge or flat peaks are returned unchanged.
+    """
+    if peak <= 0 or peak >= len(corr) - 1:
+        return float(peak)
+    left = corr[peak - 1]
+    centre = corr[peak]
+    right = corr[peak + 1]
+    curvature = left - 2.0 * centre + right
+    if curvature >= 0.0:
+        return float(peak)
+    return float(peak + 0.5 * (left - right) / curvature)
+
+
+@njit(cache=True)
+def _interval_std(times):
+    """
+    Population standard deviation of the gaps between successive times.
+    
+    Equivalent to np.std(np.diff(times)), computed with Welford's update in
+    a single pass so short beat arrays do not pay for two temporaries and
+    two reductions. Returns 0.0 for fewer than two times.
+    """
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(1, len(times)):
+        gap = times[i] - times[i - 1]
+        count += 1
+        delta = gap - mean
+        mean += delta / count
+        m2 += delta * (gap - mean)
+    return np.sqrt(m2 / count) if count > 0 else 0.0
+
+
+if NUMBA_AVAILABLE:
+    # Compile at import so the first analysis request does not pay for it
+    _score_chords(np.zeros((12, 1), dtype=np.float32), np.zeros((1, 12), dtype=np.float32),
+                  np.empty(1, dtype=np.int64))
+    _corr_argmax(np.zeros(12, dtype=np.float32), np.zeros((1, 12), dtype=np.float32))
+    _autocorr_peak(np.zeros(2))
+    _parabolic_lag(np.zeros(3), 1)
+    _interval_std(np.zeros(2))
+
 
 class ScaleType(Enum):
     """Enumeration of musical scales."""
@@ -53,362 +248,549 @@ class KeyAnalysis:
 class EnhancedMusicTheoryEngine:
     """Enhanced music theory analysis engine with comprehensive harmonic analysis."""
     
-    def __init__(self):
-        """Initialize the enhanced music theory engine."""
-        self.note_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
-        self.note_to_number = {note: i for i, note in enumerate(self.note_names)}
-        
-        # Enhanced chord definitions with extensions and inversions
-        self.chord_templates = {
-            'major': [0, 4, 7],
-            'minor': [0, 3, 7],
-            'diminished': [0, 3, 6],
-            'augmented': [0, 4, 8],
-            'major7': [0, 4, 7, 11],
-            'minor7': [0, 3, 7, 10],
-            'dominant7': [0, 4, 7, 10],
-            'diminished7': [0, 3, 6, 9],
-            'minor7b5': [0, 3, 6, 10],
-            'major9': [0, 4, 7, 11, 2],
-            'minor9': [0, 3, 7, 10, 2],
-            'dominant9': [0, 4, 7, 10, 2],
-            'major11': [0, 4, 7, 11, 2, 5],
-            'minor11': [0, 3, 7, 10, 2, 5],
-            'dominant11': [0, 4, 7, 10, 2, 5],
-            'major13': [0, 4, 7, 11, 2, 5, 9],
-            'minor13': [0, 3, 7, 10, 2, 5, 9],
-            'dominant13': [0, 4, 7, 10, 2, 5, 9],
-            'sus2': [0, 2, 7],
-            'sus4': [0, 5, 7],
-            'add9': [0, 4, 7, 2],
-            '6': [0, 4, 7, 9],
-            'minor6': [0, 3, 7, 9],
-        }
-        
-        # Scale definitions with all modes and variants
-        self.scale_templates = {
-            ScaleType.MAJOR: [0, 2, 4, 5, 7, 9, 11],
-            ScaleType.MINOR: [0, 2, 3, 5, 7, 8, 10],
-            ScaleType.DORIAN: [0, 2, 3, 5, 7, 9, 10],
-            ScaleType.PHRYGIAN: [0, 1, 3, 5, 7, 8, 10],
-            ScaleType.LYDIAN: [0, 2, 4, 6, 7, 9, 11],
-            ScaleType.MIXOLYDIAN: [0, 2, 4, 5, 7, 9, 10],
-            ScaleType.LOCRIAN: [0, 1, 3, 5, 6, 8, 10],
-            ScaleType.HARMONIC_MINOR: [0, 2, 3, 5, 7, 8, 11],
-            ScaleType.MELODIC_MINOR: [0, 2, 3, 5, 7, 9, 11],
-            ScaleType.PENTATONIC_MAJOR: [0, 2, 4, 7, 9],
-            ScaleType.PENTATONIC_MINOR: [0, 3, 5, 7, 10],
-            ScaleType.BLUES: [0, 3, 5, 6, 7, 10],
-        }
-        
-        # Enhanced key profiles for better key detection
-        self.key_profiles = {
-            'C': np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]),
-            'C#': np.array([2.88, 6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29]),
-            'D': np.array([2.29, 2.88, 6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66]),
-            'D#': np.array([3.66, 2.29, 2.88, 6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39]),
-            'E': np.array([2.39, 3.66, 2.29, 2.88, 6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19]),
-            'F': np.array([5.19, 2.39, 3.66, 2.29, 2.88, 6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52]),
-            'F#': np.array([2.52, 5.19, 2.39, 3.66, 2.29, 2.88, 6.35, 2.23, 3.48, 2.33, 4.38, 4.09]),
-            'G': np.array([4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88, 6.35, 2.23, 3.48, 2.33, 4.38]),
-            'G#': np.array([4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88, 6.35, 2.23, 3.48, 2.33]),
-            'A': np.array([2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88, 6.35, 2.23, 3.48]),
-            'A#': np.array([3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88, 6.35, 2.23]),
-            'B': np.array([2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88, 6.35])
-        }
-        
-        # Minor key profiles
-        self.minor_key_profiles = {
-            'Am': np.array([5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39, 2.60]),
-            'A#m': np.array([2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39]),
-            'Bbm': np.array([2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39]),
-            'Bm': np.array([2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15]),
-            'Cm': np.array([6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]),
-            'C#m': np.array([3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34]),
-            'Dm': np.array([3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69]),
-            'D#m': np.array([2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98]),
-            'Ebm': np.array([2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98]),
-            'Em': np.array([3.98, 2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75]),
-            'Fm': np.array([4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54]),
-            'F#m': np.array([2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53]),
-            'Gm': np.array([3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60]),
-            'G#m': np.array([2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38])
+    NOTES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+    _NOTE_IDX = {note: idx for idx, note in enumerate(NOTES)}
+    
+    # Chroma hop for harmony analysis, shared by feature extraction and the
+    # beat-to-frame conversion so the two cannot drift apart
+    CHROMA_HOP_LENGTH = 1024
+    
+    # Median smoothing of per-frame chord scores (about 22 frames at 22050 Hz
+    # with the CHROMA_HOP_LENGTH hop)
+    CHORD_SMOOTHING_SECONDS = 1.0
+    
+    # Extracted harmony features are cached next to the audio file
+    HARMONY_SIDECAR_SUFFIX = '.harmony.npz'
+    
+    # Enhanced chord definitions with extensions and inversions
+    CHORD_TEMPLATES = {
+        'major': [0, 4, 7],
+        'minor': [0, 3, 7],
+        'diminished': [0, 3, 6],
+        'augmented': [0, 4, 8],
+        'major7': [0, 4, 7, 11],
+        'minor7': [0, 3, 7, 10],
+        'dominant7': [0, 4, 7, 10],
+        'diminished7': [0, 3, 6, 9],
+        'minor7b5': [0, 3, 6, 10],
+        'major9': [0, 4, 7, 11, 2],
+        'minor9': [0, 3, 7, 10, 2],
+        'dominant9': [0, 4, 7, 10, 2],
+        'major11': [0, 4, 7, 11, 2, 5],
+        'minor11': [0, 3, 7, 10, 2, 5],
+        'dominant11': [0, 4, 7, 10, 2, 5],
+        'major13': [0, 4, 7, 11, 2, 5, 9],
+        'minor13': [0, 3, 7, 10, 2, 5, 9],
+        'dominant13': [0, 4, 7, 10, 2, 5, 9],
+        'sus2': [0, 2, 7],
+        'sus4': [0, 5, 7],
+        'add9': [0, 4, 7, 2],
+        '6': [0, 4, 7, 9],
+        'minor6': [0, 3, 7, 9],
+    }
+    
+    # Scale definitions with all modes and variants
+    SCALE_TEMPLATES = {
+        ScaleType.MAJOR: [0, 2, 4, 5, 7, 9, 11],
+        ScaleType.MINOR: [0, 2, 3, 5, 7, 8, 10],
+        ScaleType.DORIAN: [0, 2, 3, 5, 7, 9, 10],
+        ScaleType.PHRYGIAN: [0, 1, 3, 5, 7, 8, 10],
+        ScaleType.LYDIAN: [0, 2, 4, 6, 7, 9, 11],
+        ScaleType.MIXOLYDIAN: [0, 2, 4, 5, 7, 9, 10],
+        ScaleType.LOCRIAN: [0, 1, 3, 5, 6, 8, 10],
+        ScaleType.HARMONIC_MINOR: [0, 2, 3, 5, 7, 8, 11],
+        ScaleType.MELODIC_MINOR: [0, 2, 3, 5, 7, 9, 11],
+        ScaleType.PENTATONIC_MAJOR: [0, 2, 4, 7, 9],
+        ScaleType.PENTATONIC_MINOR: [0, 3, 5, 7, 10],
+        ScaleType.BLUES: [0, 3, 5, 6, 7, 10],
+    }
+    
+    # Enhanced key profiles for better key detection; every key is the
+    # C major / C minor profile rotated to its tonic (a circulant matrix)
+    KEY_PROFILES = {note: np.roll(_MAJOR_KEY_PROFILE, tonic) for tonic, note in enumerate(NOTES)}
+    
+    # Minor key profiles (enharmonic spellings share a rotation)
+    MINOR_KEY_PROFILES = {
+        name: np.roll(_MINOR_KEY_PROFILE, tonic) for name, tonic in (
+            ('Am', 9), ('A#m', 10), ('Bbm', 10), ('Bm', 11), ('Cm', 0), ('C#m', 1), ('Dm', 2),
+            ('D#m', 3), ('Ebm', 3), ('Em', 4), ('Fm', 5), ('F#m', 6), ('Gm', 7), ('G#m', 8)
+        )
+    }
+    
+    # Common chord progressions with analysis
+    COMMON_PROGRESSIONS = {
+        'I-V-vi-IV': {'roman': ['I', 'V', 'vi', 'IV'], 'description': 'Pop progression'},
+        'vi-IV-I-V': {'roman': ['vi', 'IV', 'I', 'V'], 'description': 'Pop variation'},
+        'I-vi-IV-V': {'roman': ['I', 'vi', 'IV', 'V'], 'description': '50s progression'},
+        'ii-V-I': {'roman': ['ii', 'V', 'I'], 'description': 'Jazz turnaround'},
+        'I-IV-V-I': {'roman': ['I', 'IV', 'V', 'I'], 'description': 'Classical cadence'},
+        'vi-ii-V-I': {'roman': ['vi', 'ii', 'V', 'I'], 'description': 'Circle progression'},
+        'I-bVII-IV-I': {'roman': ['I', 'bVII', 'IV', 'I'], 'description': 'Mixolydian progression'},
+        'i-VI-III-VII': {'roman': ['i', 'VI', 'III', 'VII'], 'description': 'Minor progression'}
+    }
+    
+    # Difficulty ratings for chords by instrument (1-10 scale)
+    CHORD_DIFFICULTY_RATINGS = {
+        'guitar': {
+            'C': 2, 'Am': 2, 'F': 8, 'G': 3, 'Em': 1, 'Dm': 3,
+            'A': 3, 'E': 2, 'B': 6, 'Bm': 7, 'F#m': 6, 'C#': 8,
+            'Cm': 4, 'Gm': 4, 'D': 2, 'A7': 3, 'B7': 4, 'E7': 2,
+            'F#': 9, 'Bb': 6
+        },
+        'piano': {
+            'C': 1, 'Am': 1, 'F': 2, 'G': 1, 'Em': 2, 'Dm': 2,
+            'A': 2, 'E': 3, 'B': 4, 'Bm': 3, 'F#m': 4, 'C#': 5,
+            'Cm': 3, 'Gm': 3, 'D': 2, 'Bb': 3, 'Eb': 4, 'Ab': 5,
+            'F#': 7
+        },
+        'ukulele': {
+            'C': 1, 'Am': 1, 'F': 2, 'G': 2, 'Em': 3, 'Dm': 2,
+            'A': 2, 'E': 4, 'B': 5, 'Bm': 4, 'F#m': 5, 'C#': 6,
+            'Cm': 3, 'Gm': 3, 'D': 2, 'A7': 2, 'G7': 1, 'C7': 2,
+            'F#': 7, 'Bb': 5
         }
-        
-        # Common chord progressions with analysis
-        self.common_progressions = {
-            'I-V-vi-IV': {'roman': ['I', 'V', 'vi', 'IV'], 'description': 'Pop progression'},
-            'vi-IV-I-V': {'roman': ['vi', 'IV', 'I', 'V'], 'description': 'Pop variation'},
-            'I-vi-IV-V': {'roman': ['I', 'vi', 'IV', 'V'], 'description': '50s progression'},
-            'ii-V-I': {'roman': ['ii', 'V', 'I'], 'description': 'Jazz turnaround'},
-            'I-IV-V-I': {'roman': ['I', 'IV', 'V', 'I'], 'description': 'Classical cadence'},
-            'vi-ii-V-I': {'roman': ['vi', 'ii', 'V', 'I'], 'description': 'Circle progression'},
-            'I-bVII-IV-I': {'roman': ['I', 'bVII', 'IV', 'I'], 'description': 'Mixolydian progression'},
-            'i-VI-III-VII': {'roman': ['i', 'VI', 'III', 'VII'], 'description': 'Minor progression'}
+    }
+    
+    # Easier alternatives to hard chords, per instrument
+    BEGINNER_SUBSTITUTIONS = {
+        'guitar': {
+            'F': ['Fmaj7', 'Dm', 'C', 'Cadd9'],
+            'Bm': ['D', 'G', 'Em', 'B7'],
+            'F#m': ['Em', 'Am', 'Dm', 'F#'],
+            'C#': ['C', 'D', 'Em', 'Cadd9'],
+            'F#': ['G', 'F', 'Em', 'E'],
+            'Bb': ['Am', 'C', 'F', 'Gm'],
+        },
+        'piano': {
+            'F#': ['G', 'F', 'Em'],
+            'C#': ['C', 'D', 'Db'],
+            'Bb': ['Am', 'C', 'Cm'],
+            'Db': ['C', 'D', 'Dm'],
+            'Eb': ['Em', 'D', 'F'],
+        },
+        'ukulele': {
+            'F': ['C', 'Am', 'Dm', 'G'],
+            'Bm': ['Em', 'Am', 'Dm', 'G'],
+            'E': ['Em', 'C', 'Am', 'F'],
+            'Bb': ['C', 'F', 'Am', 'Gm'],
         }
-        
-        # Chord substitution rules for different instruments
-        self.chord_substitutions = {
-            'guitar': {
-                'F': ['Fmaj7', 'Dm', 'C', 'Cadd9'],
-                'Bm': ['D', 'G', 'Em', 'B7'],
-                'F#m': ['Em', 'Am', 'Dm', 'F#'],
-                'C#': ['C', 'D', 'Em', 'Cadd9'],
-                'F#': ['G', 'F', 'Em', 'E'],
-                'Bb': ['Am', 'C', 'F', 'Gm'],
-            },
-            'piano': {
-                'F#': ['G', 'F', 'Em'],
-                'C#': ['C', 'D', 'Db'],
-                'Bb': ['Am', 'C', 'Cm'],
-                'Db': ['C', 'D', 'Dm'],
-                'Eb': ['Em', 'D', 'F'],
+    }
+    
+    # Roman-numeral progressions per style, resolved to
+    # (semitones above the key root, minor in a major key, minor in a minor key)
+    STYLE_PROGRESSIONS = {
+        # I V vi IV
+        'pop': ((0, False, True), (7, False, True), (9, True, False), (5, False, True)),
+        # I IV V I
+        'folk': ((0, False, True), (5, False, True), (7, False, True), (0, False, True)),
+        # I I I I IV IV I I V IV I V
+        'blues': ((0, False, True),) * 4 + ((5, False, True),) * 2 + ((0, False, True),) * 2 +
+                 ((7, False, True), (5, False, True), (0, False, True), (7, False, True)),
+        # I vi ii V
+        'jazz': ((0, False, True), (9, True, False), (2, True, True), (7, False, True)),
+        # I bVII IV I
+        'rock': ((0, False, True), (10, False, True), (5, False, True), (0, False, True)),
+    }
+    
+    # Curated learning paths per instrument and skill level; the lists are
+    # tuples so callers can share them without copying
+    LEARNING_PATHS = {
+        'guitar': {
+            1: {
+                'name': 'Beginner Guitar Essentials',
+                'chords': ('Em', 'Am', 'C', 'D', 'G'),
+                'songs': ('Wonderwall - Oasis', 'Horse with No Name - America'),
+                'techniques': ('Basic strumming', 'Chord transitions'),
+                'estimated_weeks': 8
             },
-            'ukulele': {
-                'F': ['C', 'Am', 'Dm', 'G'],
-                'Bm': ['Em', 'Am', 'Dm', 'G'],
-                'E': ['Em', 'C', 'Am', 'F'],
-                'Bb': ['C', 'F', 'Am', 'Gm'],
+            2: {
+                'name': 'Intermediate Guitar Skills',
+                'chords': ('F', 'Bm', 'A', 'E', 'Dm'),
+                'songs': ('Blackbird - Beatles', 'Tears in Heaven - Clapton'),
+                'techniques': ('Barre chords', 'Fingerpicking basics'),
+                'estimated_weeks': 12
             }
-        }
-        
-        # Difficulty ratings for chords by instrument (1-10 scale)
-        self.chord_difficulty = {
-            'guitar': {
-                'C': 2, 'Am': 2, 'F': 8, 'G': 3, 'Em': 1, 'Dm': 3,
-                'A': 3, 'E': 2, 'B': 6, 'Bm': 7, 'F#m': 6, 'C#': 8,
-                'Cm': 4, 'Gm': 4, 'D': 2, 'A7': 3, 'B7': 4, 'E7': 2
-            },
-            'piano': {
-                'C': 1, 'Am': 1, 'F': 2, 'G': 1, 'Em': 2, 'Dm': 2,
-                'A': 2, 'E': 3, 'B': 4, 'Bm': 3, 'F#m': 4, 'C#': 5,
-                'Cm': 3, 'Gm': 3, 'D': 2, 'Bb': 3, 'Eb': 4, 'Ab': 5
+        },
+        'piano': {
+            1: {
+                'name': 'Piano Fundamentals',
+                'chords': ('C', 'F', 'G', 'Am', 'Dm'),
+                'songs': ('Twinkle Twinkle Little Star', 'Mary Had a Little Lamb'),
+                'techniques': ('Proper posture', 'Basic scales', 'Simple melodies'),
+                'estimated_weeks': 10
             },
-            'ukulele': {
-                'C': 1, 'Am': 1, 'F': 2, 'G': 2, 'Em': 3, 'Dm': 2,
-                'A': 2, 'E': 4, 'B': 5, 'Bm': 4, 'F#m': 5, 'C#': 6,
-                'Cm': 3, 'Gm': 3, 'D': 2, 'A7': 2, 'G7': 1, 'C7': 2
+            2: {
+                'name': 'Intermediate Piano',
+                'chords': ('A', 'D', 'E', 'Bm', 'Em'),
+                'songs': ('Für Elise - Beethoven', 'Imagine - John Lennon'),
+                'techniques': ('Chord inversions', 'Basic accompaniment patterns'),
+                'estimated_weeks': 16
             }
         }
+    }
+    
+    # The same ratings on the 1-5 skill scale used by substitutions
     CHORD_DIFFICULTY = {
-        'guitar': {
-            'C': 1, 'G': 1, 'Am': 1, 'Em': 1, 'D': 2, 'A': 2,
-            'Dm': 2, 'E': 2, 'F': 4, 'Bm': 4, 'B': 3, 'F#m': 4,
-            'C#': 5, 'F#': 5, 'Bb': 3, 'Gm': 3
-        },
-        'piano': {
-            'C': 1, 'G': 1, 'F': 1, 'Am': 1, 'Dm': 1, 'Em': 2,
-            'D': 2, 'A': 2, 'E': 2, 'Bb': 3, 'F#': 4, 'C#': 4,
-            'Bm': 2, 'F#m': 3, 'Gm': 2
-        },
-        'ukulele': {
-            'C': 1, 'F': 1, 'G': 1, 'Am': 1, 'Dm': 2, 'Em': 2,
-            'A': 2, 'D': 2, 'E': 3, 'Bm': 4, 'F#m': 4, 'B': 3,
-            'F#': 4, 'C#': 5, 'Bb': 3
-        }
+        instrument: {chord: (rating + 1) // 2 for chord, rating in ratings.items()}
+        for instrument, ratings in CHORD_DIFFICULTY_RATINGS.items()
     }
     
     def __init__(self):
         """Initialize the enhanced music theory engine."""
-        self.note_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
-        self.note_to_number = {note: i for i, note in enumerate(self.note_names)}
-        
-        # Enhanced chord definitions with extensions and inversions
-        self.chord_templates = {
-            'major': [0, 4, 7],
-            'minor': [0, 3, 7],
-            'diminished': [0, 3, 6],
-            'augmented': [0, 4, 8],
-            'major7': [0, 4, 7, 11],
-            'minor7': [0, 3, 7, 10],
-            'dominant7': [0, 4, 7, 10],
-            'diminished7': [0, 3, 6, 9],
-            'minor7b5': [0, 3, 6, 10],
-            'major9': [0, 4, 7, 11, 2],
-            'minor9': [0, 3, 7, 10, 2],
-            'dominant9': [0, 4, 7, 10, 2],
-            'major11': [0, 4, 7, 11, 2, 5],
-            'minor11': [0, 3, 7, 10, 2, 5],
-            'dominant11': [0, 4, 7, 10, 2, 5],
-            'major13': [0, 4, 7, 11, 2, 5, 9],
-            'minor13': [0, 3, 7, 10, 2, 5, 9],
-            'dominant13': [0, 4, 7, 10, 2, 5, 9],
-            'sus2': [0, 2, 7],
-            'sus4': [0, 5, 7],
-            'add9': [0, 4, 7, 2],
-            '6': [0, 4, 7, 9],
-            'minor6': [0, 3, 7, 9],
-        }
+        # The note, chord, scale and key tables are class-level constants;
+        # the instance names alias them for existing callers
+        self.note_names = self.NOTES
+        self.note_to_number = self._NOTE_IDX
+        self.chord_templates = self.CHORD_TEMPLATES
+        self.scale_templates = self.SCALE_TEMPLATES
+        self.key_profiles = self.KEY_PROFILES
+        self.minor_key_profiles = self.MINOR_KEY_PROFILES
+        self.common_progressions = self.COMMON_PROGRESSIONS
         
-        # Scale definitions with all modes and variants
-        self.scale_templates = {
-            ScaleType.MAJOR: [0, 2, 4, 5, 7, 9, 11],
-            ScaleType.MINOR: [0, 2, 3, 5, 7, 8, 10],
-            ScaleType.DORIAN: [0, 2, 3, 5, 7, 9, 10],
-            ScaleType.PHRYGIAN: [0, 1, 3, 5, 7, 8, 10],
-            ScaleType.LYDIAN: [0, 2, 4, 6, 7, 9, 11],
-            ScaleType.MIXOLYDIAN: [0, 2, 4, 5, 7, 9, 10],
-            ScaleType.LOCRIAN: [0, 1, 3, 5, 6, 8, 10],
-            ScaleType.HARMONIC_MINOR: [0, 2, 3, 5, 7, 8, 11],
-            ScaleType.MELODIC_MINOR: [0, 2, 3, 5, 7, 9, 11],
-            ScaleType.PENTATONIC_MAJOR: [0, 2, 4, 7, 9],
-            ScaleType.PENTATONIC_MINOR: [0, 3, 5, 7, 10],
-            ScaleType.BLUES: [0, 3, 5, 6, 7, 10],
-        }
+        # Chord substitution rules for different instruments
+        self.chord_substitutions = self.BEGINNER_SUBSTITUTIONS
+        self.chord_difficulty = self.CHORD_DIFFICULTY_RATINGS
         
-        # Enhanced key profiles for better key detection
-        self.key_profiles = {
-            'C': np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]),
-            'C#': np.array([2.88, 6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29]),
-            'D': np.array([2.29, 2.88, 6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66]),
-            'D#': np.array([3.66, 2.29, 2.88, 6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39]),
-            'E': np.array([2.39, 3.66, 2.29, 2.88, 6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19]),
-            'F': np.array([5.19, 2.39, 3.66, 2.29, 2.88, 6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52]),
-            'F#': np.array([2.52, 5.19, 2.39, 3.66, 2.29, 2.88, 6.35, 2.23, 3.48, 2.33, 4.38, 4.09]),
-            'G': np.array([4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88, 6.35, 2.23, 3.48, 2.33, 4.38]),
-            'G#': np.array([4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88, 6.35, 2.23, 3.48, 2.33]),
-            'A': np.array([2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88, 6.35, 2.23, 3.48]),
-            'A#': np.array([3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88, 6.35, 2.23]),
-            'B': np.array([2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88, 6.35])
-        }
+        self._bind_shared_tables()
+    
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _shared_tables(cls) -> Dict[str, Any]:
+        """
+        Template, key-profile and substitution tables derived from the class
+        constants. Built once per class and shared read-only by its instances.
+        """
+        tables = {**cls._build_chord_template_matrix(), **cls._build_key_profile_matrix(),
+                  **cls._build_substitution_table(), **cls._build_scale_tables(),
+                  **cls._build_roman_chord_table()}
+        for value in tables.values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+        return tables
+    
+    def _bind_shared_tables(self):
+        """Attach the shared template, key-profile and substitution tables."""
+        self.__dict__.update(self._shared_tables())
+    
+    @classmethod
+    def _build_substitution_table(cls) -> Dict[str, Any]:
+        """
+        Precompute substitutions for every known (chord, instrument, skill level).
+        
+        Covers the chords in CHORD_DIFFICULTY and BEGINNER_SUBSTITUTIONS on
+        the 1-5 skill scale; anything else falls back to the memoized path.
+        """
+        table = {}
+        for instrument in cls.CHORD_DIFFICULTY.keys() | cls.BEGINNER_SUBSTITUTIONS.keys():
+            chords = (cls.CHORD_DIFFICULTY.get(instrument, {}).keys() |
+                      cls.BEGINNER_SUBSTITUTIONS.get(instrument, {}).keys())
+            for chord in chords:
+                for skill_level in range(1, 6):
+                    table[(chord, instrument, skill_level)] = \
+                        cls._cached_chord_substitutions(chord, instrument, skill_level)
+        return {'_substitution_table': table}
+    
+    @classmethod
+    def _build_scale_tables(cls) -> Dict[str, Any]:
+        """
+        Spell every scale, and the diatonic chords of major and minor keys,
+        for all twelve roots.
         
-        # Minor key profiles
-        self.minor_key_profiles = {
-            'Am': np.array([5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39, 2.60]),
-            'A#m': np.array([2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39]),
-            'Bbm': np.array([2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39]),
-            'Bm': np.array([2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15]),
-            'Cm': np.array([6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]),
-            'C#m': np.array([3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34]),
-            'Dm': np.array([3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69]),
-            'D#m': np.array([2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98]),
-            'Ebm': np.array([2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98]),
-            'Em': np.array([3.98, 2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54, 4.75]),
-            'Fm': np.array([4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53, 2.54]),
-            'F#m': np.array([2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60, 3.53]),
-            'Gm': np.array([3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38, 2.60]),
-            'G#m': np.array([2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17, 6.15, 2.39, 2.60, 5.38])
+        Row r of each (12, n) table is the scale rooted at NOTES[r], so a
+        lookup replaces the per-call modular arithmetic.
+        """
+        notes = np.array(cls.NOTES)
+        roots = np.arange(12)[:, None]
+        scale_notes = {
+            scale_type: tuple(map(tuple, notes[(roots + np.array(intervals)) % 12].tolist()))
+            for scale_type, intervals in cls.SCALE_TEMPLATES.items()
         }
         
-        # Common chord progressions with analysis
-        self.common_progressions = {
-            'I-V-vi-IV': {'roman': ['I', 'V', 'vi', 'IV'], 'description': 'Pop progression'},
-            'vi-IV-I-V': {'roman': ['vi', 'IV', 'I', 'V'], 'description': 'Pop variation'},
-            'I-vi-IV-V': {'roman': ['I', 'vi', 'IV', 'V'], 'description': '50s progression'},
-            'ii-V-I': {'roman': ['ii', 'V', 'I'], 'description': 'Jazz turnaround'},
-            'I-IV-V-I': {'roman': ['I', 'IV', 'V', 'I'], 'description': 'Classical cadence'},
-            'vi-ii-V-I': {'roman': ['vi', 'ii', 'V', 'I'], 'description': 'Circle progression'},
-            'I-bVII-IV-I': {'roman': ['I', 'bVII', 'IV', 'I'], 'description': 'Mixolydian progression'},
-            'i-VI-III-VII': {'roman': ['i', 'VI', 'III', 'VII'], 'description': 'Minor progression'}
+        # I, ii, iii, IV, V, vi, vii° and i, ii°, III, iv, v, VI, VII
+        chord_qualities = {
+            'major': (ScaleType.MAJOR, ['', 'm', 'm', '', '', 'm', 'dim']),
+            'minor': (ScaleType.MINOR, ['m', 'dim', '', 'm', 'm', '', '']),
+        }
+        diatonic_chords = {
+            mode: tuple(
+                tuple(f"{note}{quality}" for note, quality in zip(row, qualities))
+                for row in scale_notes[scale_type]
+            )
+            for mode, (scale_type, qualities) in chord_qualities.items()
         }
         
-        # Chord substitution rules for different instruments
-        self.chord_substitutions = {
-            'guitar': {
-                'F': ['Fmaj7', 'Dm', 'C', 'Cadd9'],
-                'Bm': ['D', 'G', 'Em', 'B7'],
-                'F#m': ['Em', 'Am', 'Dm', 'F#'],
-                'C#': ['C', 'D', 'Em', 'Cadd9'],
-                'F#': ['G', 'F', 'Em', 'E'],
-                'Bb': ['Am', 'C', 'F', 'Gm'],
-            },
-            'piano': {
-                'F#': ['G', 'F', 'Em'],
-                'C#': ['C', 'D', 'Db'],
-                'Bb': ['Am', 'C', 'Cm'],
-                'Db': ['C', 'D', 'Dm'],
-                'Eb': ['Em', 'D', 'F'],
-            },
-            'ukulele': {
-                'F': ['C', 'Am', 'Dm', 'G'],
-                'Bm': ['Em', 'Am', 'Dm', 'G'],
-                'E': ['Em', 'C', 'Am', 'F'],
-                'Bb': ['C', 'F', 'Am', 'Gm'],
-            }
+        return {'_scale_note_table': scale_notes, '_diatonic_chord_table': diatonic_chords}
+    
+    @classmethod
+    def _build_roman_chord_table(cls) -> Dict[str, Any]:
+        """
+        Resolve every Roman numeral used by COMMON_PROGRESSIONS in every key.
+        
+        Numerals are scale degrees of the key's major or natural minor scale
+        ('b' lowers by a semitone); upper case is a major chord, lower case a
+        minor one. Chords are spelled like the chord detector names them.
+        """
+        degrees = ['I', 'II', 'III', 'IV', 'V', 'VI', 'VII']
+        numerals = {numeral for prog in cls.COMMON_PROGRESSIONS.values() for numeral in prog['roman']}
+        keys = [(key, 'major') for key in cls.KEY_PROFILES] + \
+               [(key, 'minor') for key in cls.MINOR_KEY_PROFILES]
+        
+        table = {}
+        for key, mode in keys:
+            tonic = cls._NOTE_IDX.get(key[:-1] if mode == 'minor' else key)
+            if tonic is None:
+                # Flat spellings (Bbm, Ebm) share the sharp key's chords
+                tonic = cls._NOTE_IDX[cls.NOTES[(cls._NOTE_IDX[key[0]] - 1) % 12]]
+            scale = cls.SCALE_TEMPLATES[ScaleType.MAJOR if mode == 'major' else ScaleType.MINOR]
+            chords = {}
+            for numeral in numerals:
+                flat = numeral.startswith('b')
+                base = numeral[1:] if flat else numeral
+                root = cls.NOTES[(tonic + scale[degrees.index(base.upper())] - flat) % 12]
+                chords[numeral] = f"{root}minor" if base.islower() else root
+            table[key] = chords
+        
+        return {'_roman_chord_table': table}
+    
+    @classmethod
+    def _build_chord_template_matrix(cls) -> Dict[str, Any]:
+        """
+        Precompute every (root, chord type) template as rows of one matrix.
+        
+        Rows are mean-centered and scaled to unit norm, so correlating a
+        chroma vector with all templates is a single matrix-vector product.
+        Row order follows NOTES then CHORD_TEMPLATES, matching the
+        order the per-template loops used to visit them.
+        """
+        chord_labels = [
+            (root, quality) for root in cls.NOTES for quality in cls.CHORD_TEMPLATES
+        ]
+        
+        # Pitch-class bitmap of every chord type rooted at C, filled with one
+        # scatter, then rotated to all twelve roots with one gather:
+        # templates[root, quality, pc] = quality_masks[quality, (pc - root) % 12]
+        intervals = list(cls.CHORD_TEMPLATES.values())
+        quality_masks = np.zeros((len(intervals), 12), dtype=np.float32)
+        quality_masks[np.repeat(np.arange(len(intervals)), [len(iv) for iv in intervals]),
+                      np.concatenate(intervals) % 12] = 1
+        roots = np.array([cls._NOTE_IDX[root] for root in cls.NOTES])
+        rotation = (np.arange(12)[None, :] - roots[:, None]) % 12
+        templates = np.ascontiguousarray(
+            quality_masks[:, rotation].transpose(1, 0, 2).reshape(len(chord_labels), 12)
+        )
+        template_centered = templates - templates.mean(axis=1, keepdims=True)
+        
+        return {
+            '_chord_labels': chord_labels,
+            '_chord_names': [f"{root}{quality if quality != 'major' else ''}"
+                             for root, quality in chord_labels],
+            '_template_matrix': templates,
+            # Zero-mean, unit-norm rows: normalized once here, so matching
+            # only has to center (and, for scores, normalize) the chroma
+            '_template_unit': template_centered /
+                              np.linalg.norm(template_centered, axis=1, keepdims=True),
         }
+    
+    @classmethod
+    def _build_key_profile_matrix(cls) -> Dict[str, Any]:
+        """
+        Stack the major then minor key profiles into one normalized matrix.
         
-        # Difficulty ratings for chords by instrument (1-10 scale)
-        self.chord_difficulty = {
-            'guitar': {
-                'C': 2, 'Am': 2, 'F': 8, 'G': 3, 'Em': 1, 'Dm': 3,
-                'A': 3, 'E': 2, 'B': 6, 'Bm': 7, 'F#m': 6, 'C#': 8,
-                'Cm': 4, 'Gm': 4, 'D': 2, 'A7': 3, 'B7': 4, 'E7': 2
-            },
-            'piano': {
-                'C': 1, 'Am': 1, 'F': 2, 'G': 1, 'Em': 2, 'Dm': 2,
-                'A': 2, 'E': 3, 'B': 4, 'Bm': 3, 'F#m': 4, 'C#': 5,
-                'Cm': 3, 'Gm': 3, 'D': 2, 'Bb': 3, 'Eb': 4, 'Ab': 5
-            },
-            'ukulele': {
-                'C': 1, 'Am': 1, 'F': 2, 'G': 2, 'Em': 3, 'Dm': 2,
-                'A': 2, 'E': 4, 'B': 5, 'Bm': 4, 'F#m': 5, 'C#': 6,
-                'Cm': 3, 'Gm': 3, 'D': 2, 'A7': 2, 'G7': 1, 'C7': 2
-            }
+        Correlating an averaged chroma vector with every key is then a single
+        matrix-vector product; the first _n_major_keys rows are major keys.
+        """
+        profiles = np.array(
+            list(cls.KEY_PROFILES.values()) + list(cls.MINOR_KEY_PROFILES.values()),
+            dtype=np.float32
+        )
+        key_centered = profiles - profiles.mean(axis=1, keepdims=True)
+        
+        return {
+            '_key_names': list(cls.KEY_PROFILES) + list(cls.MINOR_KEY_PROFILES),
+            '_n_major_keys': len(cls.KEY_PROFILES),
+            # Zero-mean, unit-norm rows: a dot product with a normalized
+            # chroma is directly the Pearson correlation
+            '_key_unit': key_centered / np.linalg.norm(key_centered, axis=1, keepdims=True),
         }
     
-    def analyze_audio_harmony(self, audio_path: str) -> Dict:
+    def analyze_audio_harmony(self, audio_path: str, persist: bool = True) -> Dict:
         """
         Analyze audio file to extract harmonic information including
         key, chord progressions, and tempo.
+        
+        Results are cached per (path, mtime, size), so re-analyzing an
+        unchanged file skips decoding and feature extraction; callers get a
+        deep copy they are free to mutate.
+        
+        Args:
+            audio_path: Audio file to analyze
+            persist: False for throwaway files (e.g. temporary uploads),
+                which bypasses the in-memory cache and the feature sidecar
         """
         try:
-            # Load audio
-            y, sr = librosa.load(audio_path, sr=22050)
-            
-            # Extract features
-            chroma = librosa.feature.chroma_stft(y=y, sr=sr, hop_length=1024)
-            tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
-            
-            # Analyze key
-            key_analysis = self._enhanced_key_detection(chroma)
-            
-            # Analyze chord progression
-            chord_progression = self._analyze_chord_progression(chroma, beats, sr)
-            
-            # Generate recommendations
-            recommendations = self._generate_recommendations(key_analysis, chord_progression)
-            
-            return {
-                'key_analysis': key_analysis.__dict__ if hasattr(key_analysis, '__dict__') else key_analysis,
-                'chord_progression': chord_progression,
-                'tempo': float(tempo),
-                'time_signature': self._estimate_time_signature(y, sr),
-                'recommendations': recommendations,
-                'harmonic_complexity': self._calculate_harmonic_complexity(chord_progression),
-                'mood_analysis': self._analyze_mood(key_analysis, tempo, chord_progression)
-            }
+            if not persist:
+                return self._analyze_audio_harmony(audio_path, persist=False)
+            stat = os.stat(audio_path)
+            result = self._cached_audio_harmony(audio_path, stat.st_mtime_ns, stat.st_size)
+            return copy.deepcopy(result)
             
         except Exception as e:
             logger.error(f"Error in harmonic analysis: {str(e)}")
             return {'error': str(e)}
     
+    @classmethod
+    @functools.lru_cache(maxsize=32)
+    def _cached_audio_harmony(cls, audio_path: str, mtime_ns: int, size: int) -> Dict:
+        """
+        Memoized analyze_audio_harmony; mtime and size key the cache.
+        
+        The analysis depends only on the file and the class-level tables, so
+        it is cached per class rather than per (engine, file).
+        """
+        return cls()._analyze_audio_harmony(audio_path)
+    
+    def _analyze_audio_harmony(self, audio_path: str, persist: bool = True) -> Dict:
+        """Uncached body of analyze_audio_harmony; persist reads and writes the sidecar."""
+        sr = 22050
+        features = self._load_harmony_features(audio_path) if persist else None
+        if features is None:
+            # Load audio
+            y, sr = self._load_audio(audio_path, sr=sr)
+            
+            # Extract features; beat tracking only needs the signal, so it runs
+            # on a worker thread while the chroma STFT runs here (both release
+            # the GIL in their kernels)
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                beat_future = executor.submit(librosa.beat.beat_track, y=y, sr=sr)
+                chroma = librosa.feature.chroma_stft(y=y, sr=sr, hop_length=self.CHROMA_HOP_LENGTH)
+                tempo, beats = beat_future.result()
+            tempo = float(np.squeeze(tempo))
+            
+            # The time-signature heuristic reuses the tracked beats
+            time_signature = self._estimate_time_signature(sr=sr, tempo=tempo, beats=beats)
+            if persist:
+                self._save_harmony_features(audio_path, chroma, tempo, beats, time_signature)
+        else:
+            chroma, tempo, beats, time_signature = features
+        
+        # Analyze key
+        key_analysis = self._enhanced_key_detection(chroma)
+        
+        # Analyze chord progression
+        chord_progression = self._analyze_chord_progression(chroma, beats, sr)
+        
+        # Generate recommendations
+        recommendations = self._generate_recommendations(key_analysis, chord_progression)
+        
+        # Complexity and mood both summarize the chord names; count them once
+        chord_counts = self._count_chords(chord_progression)
+        
+        return {
+            'key_analysis': key_analysis.__dict__ if hasattr(key_analysis, '__dict__') else key_analysis,
+            'chord_progression': chord_progression,
+            'tempo': tempo,
+            'time_signature': time_signature,
+            'recommendations': recommendations,
+            'harmonic_complexity': self._calculate_harmonic_complexity(chord_progression, chord_counts),
+            'mood_analysis': self._analyze_mood(key_analysis, tempo, chord_progression, chord_counts)
+        }
+    
+    def _load_harmony_features(self, audio_path: str) -> Optional[Tuple[np.ndarray, float, np.ndarray, str]]:
+        """
+        Read chroma, tempo, beats and time signature from the file's sidecar.
+        
+        Returns None when there is no sidecar, it is older than the audio, or
+        it cannot be read, in which case the features are recomputed.
+        """
+        sidecar = audio_path + self.HARMONY_SIDECAR_SUFFIX
+        try:
+            if os.path.getmtime(sidecar) < os.path.getmtime(audio_path):
+                return None
+            with np.load(sidecar) as data:
+                return (data['chroma'], float(data['tempo']), data['beats'],
+                        str(data['time_signature']))
+        except (OSError, KeyError, ValueError):
+            return None
+    
+    def _save_harmony_features(self, audio_path: str, chroma: np.ndarray, tempo: float,
+                               beats: np.ndarray, time_signature: str):
+        """Write the extracted features next to the audio file; failures are only logged."""
+        sidecar = audio_path + self.HARMONY_SIDECAR_SUFFIX
+        try:
+            # Write to a temporary file and rename, so concurrent readers never
+            # see a partial sidecar
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(sidecar)),
+                                            suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, chroma=chroma.astype(np.float32), tempo=tempo,
+                                    beats=beats, time_signature=time_signature)
+            os.replace(tmp_path, sidecar)
+        except OSError as e:
+            logger.warning(f"Could not write harmony feature cache {sidecar}: {str(e)}")
+    
+    def analyze_audio_harmony_batch(self, audio_paths: List[str],
+                                    max_workers: Optional[int] = None) -> List[Dict]:
+        """
+        Run analyze_audio_harmony over several files concurrently.
+        
+        Decoding, FFTs, BLAS and the numba chord scorer all release the GIL,
+        so threads scale with cores without pickling audio between processes.
+        
+        Args:
+            audio_paths: Audio files to analyze
+            max_workers: Thread count (defaults to the CPU count)
+            
+        Returns:
+            One analysis dict per path, in input order
+        """
+        if not audio_paths:
+            return []
+        
+        max_workers = max_workers or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(audio_paths))) as executor:
+            return list(executor.map(self.analyze_audio_harmony, audio_paths))
+    
+    def _load_audio(self, audio_path: str, sr: int = 22050) -> Tuple[np.ndarray, int]:
+        """
+        Load audio as mono float32 at the requested sample rate.
+        
+        Files already at that rate are read directly with soundfile, skipping
+        librosa.load's resampling pass; everything else goes through librosa.
+        """
+        try:
+            if sf.info(audio_path).samplerate == sr:
+                y, _ = sf.read(audio_path, dtype='float32', always_2d=True)
+                return np.ascontiguousarray(y.mean(axis=1, dtype=np.float32)), sr
+        except RuntimeError:
+            # Format soundfile cannot decode (e.g. some compressed formats)
+            pass
+        return librosa.load(audio_path, sr=sr)
+    
     def _enhanced_key_detection(self, chroma: np.ndarray) -> KeyAnalysis:
         """Enhanced key detection using multiple algorithms."""
-        # Average chroma over time
-        avg_chroma = np.mean(chroma, axis=1)
-        
-        # Normalize
-        avg_chroma = avg_chroma / (np.sum(avg_chroma) + 1e-8)
-        
-        # Test against major keys
-        major_correlations = {}
-        for key, profile in self.key_profiles.items():
-            profile_norm = profile / np.sum(profile)
-            correlation = np.corrcoef(avg_chroma, profile_norm)[0, 1]
-            if not np.isnan(correlation):
-                major_correlations[key] = correlation
-        
-        # Test against minor keys
-        minor_correlations = {}
-        for key, profile in self.minor_key_profiles.items():
-            profile_norm = profile / np.sum(profile)
-            correlation = np.corrcoef(avg_chroma, profile_norm)[0, 1]
-            if not np.isnan(correlation):
-                minor_correlations[key] = correlation
+        # Average chroma over time (float32, like the profile matrix); no L1
+        # normalization, since correlation is invariant to scale
+        avg_chroma = np.mean(chroma, axis=1, dtype=np.float32)
+        
+        # Correlate against all major and minor key profiles; a flat chroma
+        # correlates with nothing and falls back to C / Am at 0.0
+        n_major = self._n_major_keys
+        if NUMBA_AVAILABLE:
+            best_major_idx, major_corr = _corr_argmax(avg_chroma, self._key_unit[:n_major])
+            best_minor_idx, minor_corr = _corr_argmax(avg_chroma, self._key_unit[n_major:])
+            best_minor_idx += n_major
+        else:
+            centered = avg_chroma - avg_chroma.mean()
+            centered /= np.linalg.norm(centered) + 1e-12
+            correlations = self._key_unit @ centered
+            best_major_idx = int(np.argmax(correlations[:n_major]))
+            best_minor_idx = n_major + int(np.argmax(correlations[n_major:]))
+            major_corr = correlations[best_major_idx]
+            minor_corr = correlations[best_minor_idx]
         
         # Find best matches
-        best_major = max(major_correlations.items(), key=lambda x: x[1]) if major_correlations else ('C', 0.0)
-        best_minor = max(minor_correlations.items(), key=lambda x: x[1]) if minor_correlations else ('Am', 0.0)
+        best_major = (self._key_names[best_major_idx], major_corr)
+        best_minor = (self._key_names[best_minor_idx], minor_corr)
         
         # Determine final key
         if best_major[1] > best_minor[1]:
@@ -437,69 +819,104 @@ class EnhancedMusicTheoryEngine:
     
     def _analyze_chord_progression(self, chroma: np.ndarray, beats: np.ndarray, sr: int) -> List[Dict[str, Any]]:
         """Analyze chord progression over time."""
-        chord_progression = []
-        
         # Segment audio by beats
         beat_times = librosa.frames_to_time(beats, sr=sr)
+        if len(beat_times) < 2:
+            return []
+        beat_frames = np.minimum(
+            librosa.time_to_frames(beat_times, sr=sr, hop_length=self.CHROMA_HOP_LENGTH),
+            chroma.shape[1]
+        )
+        starts, ends = beat_frames[:-1], beat_frames[1:]
+        valid = np.flatnonzero(ends > starts)
+        if len(valid) == 0:
+            return []
         
-        for i in range(min(len(beat_times) - 1, 20)):  # Limit to first 20 beats for performance
-            start_frame = librosa.time_to_frames(beat_times[i], sr=sr, hop_length=1024)
-            end_frame = librosa.time_to_frames(beat_times[i + 1], sr=sr, hop_length=1024)
-            
-            if end_frame > start_frame:
-                # Extract chroma for this segment
-                segment_chroma = np.mean(chroma[:, start_frame:end_frame], axis=1)
-                
-                # Detect chord
-                chord_info = self._detect_chord_from_chroma(segment_chroma)
-                chord_info['timestamp'] = float(beat_times[i])
-                chord_info['duration'] = float(beat_times[i + 1] - beat_times[i])
-                
-                chord_progression.append(chord_info)
+        # Correlate every frame with every template in one product, then
+        # median-smooth the scores over time so single-frame outliers (onsets,
+        # passing notes) cannot flip a beat's chord
+        frames = np.asarray(chroma, dtype=np.float32)
+        centered = frames - frames.mean(axis=0)
+        centered /= np.linalg.norm(centered, axis=0) + 1e-12
+        smoothing = max(1, int(round(self.CHORD_SMOOTHING_SECONDS * sr / self.CHROMA_HOP_LENGTH)))
+        scores = median_filter(self._template_unit @ centered, size=(1, smoothing), mode='nearest')
+        
+        # Mean smoothed score of every beat segment, summed in place with one
+        # reduceat. Beats are sorted, so each valid segment ends where the
+        # next one starts; only the last needs an explicit end (unless it
+        # runs to the end of the chroma, which reduceat covers anyway)
+        bounds = starts[valid]
+        if ends[valid[-1]] < chroma.shape[1]:
+            bounds = np.append(bounds, ends[valid[-1]])
+        segment_scores = np.add.reduceat(scores, bounds, axis=1)[:, :len(valid)]
+        segment_scores /= ends[valid] - starts[valid]
+        
+        # Best template per beat; its mean correlation is the confidence
+        best_ids = segment_scores.argmax(axis=0)
+        confidences = segment_scores[best_ids, np.arange(len(valid))].tolist()
+        
+        # Beat timestamps and durations for every kept segment in one pass
+        timestamps = beat_times[valid].tolist()
+        durations = np.diff(beat_times)[valid].tolist()
+        
+        chord_progression = []
+        for best, confidence, timestamp, duration in zip(best_ids.tolist(), confidences,
+                                                         timestamps, durations):
+            chord_info = self._chord_match(best, confidence)
+            chord_info['timestamp'] = timestamp
+            chord_info['duration'] = duration
+            chord_progression.append(chord_info)
         
         return chord_progression
     
     def _detect_chord_from_chroma(self, chroma: np.ndarray) -> Dict[str, Any]:
         """Detect chord from chroma vector."""
-        best_match = {'chord': 'N', 'confidence': 0.0, 'root': '', 'quality': ''}
+        if NUMBA_AVAILABLE:
+            best, confidence = _corr_argmax(np.ascontiguousarray(chroma, dtype=np.float32),
+                                            self._template_unit)
+            return self._chord_match(best, confidence)
+        return self._detect_chords_from_chroma(np.asarray(chroma)[:, None])[0]
+    
+    def _detect_chords_from_chroma(self, segment_chroma: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Detect the best chord for every column of a (12, n_segments) chroma.
+        
+        Columns are normalized to zero mean and unit norm, so one product with
+        the unit template rows gives the correlation of every segment with
+        every chord. A segment whose best correlation is not positive (flat or
+        anti-correlated) is reported as 'N'.
+        """
+        segment_chroma = np.asarray(segment_chroma, dtype=np.float32)
+        centered = segment_chroma - segment_chroma.mean(axis=0)
+        centered /= np.linalg.norm(centered, axis=0) + 1e-12
+        scores = self._template_unit @ centered
         
-        # Normalize chroma
-        chroma_norm = chroma / (np.sum(chroma) + 1e-8)
+        best_ids = scores.argmax(axis=0)
+        best_scores = scores[best_ids, np.arange(scores.shape[1])].tolist()
         
-        for root_idx, root in enumerate(self.note_names):
-            for quality, intervals in self.chord_templates.items():
-                # Create chord template
-                template = np.zeros(12)
-                for interval in intervals:
-                    template[(root_idx + interval) % 12] = 1
-                
-                # Normalize template
-                template = template / (np.sum(template) + 1e-8)
-                
-                # Calculate correlation
-                correlation = np.corrcoef(chroma_norm, template)[0, 1] if np.sum(template) > 0 else 0
-                
-                if not np.isnan(correlation) and correlation > best_match['confidence']:
-                    chord_name = f"{root}{quality}" if quality != 'major' else root
-                    best_match = {
-                        'chord': chord_name,
-                        'confidence': float(correlation),
-                        'root': root,
-                        'quality': quality,
-                        'intervals': intervals
-                    }
-        
-        return best_match
+        return [self._chord_match(best, confidence)
+                for best, confidence in zip(best_ids.tolist(), best_scores)]
+    
+    def _chord_match(self, best: int, confidence: float) -> Dict[str, Any]:
+        """Describe template row best, or no chord ('N') unless confidence is positive."""
+        if confidence <= 0.0:
+            return {'chord': 'N', 'confidence': 0.0, 'root': '', 'quality': ''}
+        
+        root, quality = self._chord_labels[best]
+        return {
+            'chord': self._chord_names[best],
+            'confidence': float(confidence),
+            'root': root,
+            'quality': quality,
+            'intervals': self.chord_templates[quality]
+        }
     
     def _get_scale_notes(self, root: str, scale_type: ScaleType) -> List[str]:
         """Get notes in a scale."""
         if root not in self.note_to_number:
             return []
-            
-        root_idx = self.note_to_number[root]
-        intervals = self.scale_templates[scale_type]
         
-        return [self.note_names[(root_idx + interval) % 12] for interval in intervals]
+        return list(self._scale_note_table[scale_type][self.note_to_number[root]])
     
     def _find_relative_keys(self, key: str, mode: str) -> List[str]:
         """Find relative major/minor keys."""
@@ -545,26 +962,8 @@ class EnhancedMusicTheoryEngine:
             if root not in self.note_to_number:
                 return []
                 
-            root_idx = self.note_to_number[root]
-            
-            if mode == 'major':
-                # I, ii, iii, IV, V, vi, vii°
-                chord_qualities = ['', 'm', 'm', '', '', 'm', 'dim']
-            else:
-                # i, ii°, III, iv, v, VI, VII
-                chord_qualities = ['m', 'dim', '', 'm', 'm', '', '']
-            
-            scale_intervals = self.scale_templates[ScaleType.MAJOR if mode == 'major' else ScaleType.MINOR]
-            chords = []
-            
-            for i, quality in enumerate(chord_qualities):
-                if i < len(scale_intervals):
-                    chord_root_idx = (root_idx + scale_intervals[i]) % 12
-                    chord_root = self.note_names[chord_root_idx]
-                    chord_name = f"{chord_root}{quality}"
-                    chords.append(chord_name)
-            
-            return chords
+            mode = 'major' if mode == 'major' else 'minor'
+            return list(self._diatonic_chord_table[mode][self.note_to_number[root]])
         except:
             return []
     
@@ -587,17 +986,17 @@ class EnhancedMusicTheoryEngine:
                     if self._matches_progression_pattern(chord_names, prog_data['roman'], key_analysis.key):
                         recommendations['progression_analysis'][prog_name] = prog_data['description']
             
+            # Distinct chords in order of first appearance; everything below
+            # only needs each chord once
+            unique_chords = dict.fromkeys(chord_info.get('chord', '') for chord_info in chord_progression)
+            
             # Practice suggestions based on difficulty
-            difficult_chords = []
-            for chord_info in chord_progression:
-                chord = chord_info.get('chord', '')
-                if chord in self.chord_difficulty.get('guitar', {}):
-                    if self.chord_difficulty['guitar'][chord] > 6:
-                        difficult_chords.append(chord)
+            guitar_difficulty = self.chord_difficulty.get('guitar', {})
+            difficult_chords = [chord for chord in unique_chords if guitar_difficulty.get(chord, 0) > 6]
             
             if difficult_chords:
                 recommendations['practice_suggestions'].append(
-                    f"Focus on practicing these challenging chords: {', '.join(set(difficult_chords))}"
+                    f"Focus on practicing these challenging chords: {', '.join(difficult_chords)}"
                 )
             
             # Theory insights
@@ -606,13 +1005,14 @@ class EnhancedMusicTheoryEngine:
                 f"which uses the notes: {', '.join(key_analysis.scale_notes)}"
             )
             
-            # Chord substitutions
-            for instrument in ['guitar', 'piano', 'ukulele']:
-                subs = {}
-                for chord_info in chord_progression:
-                    chord = chord_info.get('chord', '')
-                    if chord in self.chord_substitutions.get(instrument, {}):
-                        subs[chord] = self.chord_substitutions[instrument][chord]
+            # Chord substitutions; instruments without a table are skipped up
+            # front instead of probing an empty fallback dict per chord
+            substitutions = self.chord_substitutions
+            instrument_tables = [(instrument, substitutions[instrument])
+                                 for instrument in ('guitar', 'piano', 'ukulele')
+                                 if instrument in substitutions]
+            for instrument, instrument_subs in instrument_tables:
+                subs = {chord: instrument_subs[chord] for chord in unique_chords if chord in instrument_subs}
                 if subs:
                     recommendations['chord_substitutions'][instrument] = subs
                     
@@ -623,15 +1023,30 @@ class EnhancedMusicTheoryEngine:
     
     def _matches_progression_pattern(self, chord_names: List[str], pattern: List[str], key: str) -> bool:
         """Check if chord progression matches a roman numeral pattern."""
-        # This is a simplified implementation
-        return len(chord_names) >= len(pattern) and len(set(chord_names)) >= 2
+        chords = self._roman_chord_table.get(key)
+        if chords is None:
+            return False
+        expected = tuple(chords[numeral] for numeral in pattern)
+        
+        # Compare chord changes, so a chord held over several beats counts once
+        changes = tuple(name for i, name in enumerate(chord_names)
+                        if i == 0 or name != chord_names[i - 1])
+        width = len(expected)
+        return any(changes[i:i + width] == expected for i in range(len(changes) - width + 1))
+    
+    def _count_chords(self, chord_progression: List[Dict]) -> Counter:
+        """Count how often each chord name occurs; missing names count as 'N'."""
+        return Counter(chord.get('chord', 'N') for chord in chord_progression)
     
-    def _calculate_harmonic_complexity(self, chord_progression: List[Dict]) -> float:
+    def _calculate_harmonic_complexity(self, chord_progression: List[Dict],
+                                       chord_counts: Optional[Counter] = None) -> float:
         """Calculate harmonic complexity score."""
         if not chord_progression:
             return 0.0
         
-        unique_chords = set(chord.get('chord', 'N') for chord in chord_progression if chord.get('chord', 'N') != 'N')
+        if chord_counts is None:
+            chord_counts = self._count_chords(chord_progression)
+        unique_chords = [chord for chord in chord_counts if chord != 'N']
         chord_changes = len(chord_progression)
         
         # Factors: number of unique chords, frequency of changes, chord complexity
@@ -639,12 +1054,13 @@ class EnhancedMusicTheoryEngine:
         complexity_score += min(chord_changes / 10, 3) * 0.2  # Normalize by expected length
         
         # Add points for complex chords (7ths, 9ths, etc.)
-        complex_chord_bonus = sum(1 for chord in unique_chords if any(x in chord for x in ['7', '9', '11', '13', 'dim', 'aug']))
+        complex_chord_bonus = sum(1 for chord in unique_chords if _COMPLEX_CHORD_RE.search(chord))
         complexity_score += complex_chord_bonus * 0.5
         
         return min(complexity_score, 10.0)  # Cap at 10
     
-    def _analyze_mood(self, key_analysis: KeyAnalysis, tempo: float, chord_progression: List[Dict]) -> str:
+    def _analyze_mood(self, key_analysis: KeyAnalysis, tempo: float, chord_progression: List[Dict],
+                      chord_counts: Optional[Counter] = None) -> str:
         """Analyze musical mood based on key, tempo, and harmony."""
         mood_factors = []
         
@@ -664,7 +1080,11 @@ class EnhancedMusicTheoryEngine:
         
         # Harmony-based mood
         try:
-            complex_chords = sum(1 for chord in chord_progression if any(x in chord.get('chord', '') for x in ['7', '9', 'dim']))
+            # Test each distinct chord once and weight it by its occurrences
+            if chord_counts is None:
+                chord_counts = self._count_chords(chord_progression)
+            complex_chords = sum(count for chord, count in chord_counts.items()
+                                 if _COLORFUL_CHORD_RE.search(chord))
             if len(chord_progression) > 0 and complex_chords > len(chord_progression) * 0.3:
                 mood_factors.append('sophisticated')
         except:
@@ -672,20 +1092,29 @@ class EnhancedMusicTheoryEngine:
         
         return ' and '.join(mood_factors) if mood_factors else 'neutral'
     
-    def _estimate_time_signature(self, y: np.ndarray, sr: int) -> str:
-        """Estimate time signature of the audio."""
+    def _estimate_time_signature(self, y: Optional[np.ndarray] = None, sr: int = 22050, *,
+                                 tempo: Optional[float] = None,
+                                 beats: Optional[np.ndarray] = None) -> str:
+        """
+        Estimate time signature of the audio.
+        
+        Callers that have already beat-tracked the signal pass tempo and beats
+        so the onset envelope and beat tracker are not run a second time;
+        otherwise they are computed from y.
+        """
         try:
-            # Simplified time signature detection
-            onset_envelope = librosa.onset.onset_strength(y=y, sr=sr)
-            tempo, beats = librosa.beat.beat_track(onset_envelope=onset_envelope, sr=sr)
+            if beats is None or tempo is None:
+                # Simplified time signature detection
+                onset_envelope = librosa.onset.onset_strength(y=y, sr=sr)
+                tempo, beats = librosa.beat.beat_track(onset_envelope=onset_envelope, sr=sr)
+            tempo = float(np.squeeze(tempo))
             
             # Analyze beat patterns to guess time signature
             if len(beats) > 1:
-                beat_intervals = np.diff(librosa.frames_to_time(beats, sr=sr))
-                avg_beat_interval = np.mean(beat_intervals)
+                beat_interval_std = _interval_std(librosa.frames_to_time(beats, sr=sr))
                 
                 # Simple heuristic based on tempo and beat patterns
-                if tempo > 150 and np.std(beat_intervals) < 0.1:
+                if tempo > 150 and beat_interval_std < 0.1:
                     return "4/4"
                 elif tempo < 100:
                     return "3/4"
@@ -693,55 +1122,121 @@ class EnhancedMusicTheoryEngine:
                     return "4/4"  # Default assumption
             else:
                 return "4/4"
-        except:
+        except (librosa.util.exceptions.ParameterError, ValueError) as e:
+            logger.warning(f"Time signature estimation failed: {str(e)}")
             return "4/4"
-            timestamp = i / frames_per_second
-            
+    
+    def _detect_chord_progression(self, chroma: np.ndarray, sr: int,
+                                  hop_length: int = CHROMA_HOP_LENGTH) -> List[Dict[str, Any]]:
+        """
+        Detect chords over fixed two-second segments of a chromagram.
+        
+        hop_length must be the hop the chromagram was computed with; it
+        defaults to CHROMA_HOP_LENGTH, the hop of this engine's chroma.
+        """
+        progression = []
+        chroma = np.ascontiguousarray(chroma, dtype=np.float32)
+        frames_per_second = sr / hop_length
+        segment_length = max(1, int(frames_per_second * 2))
+        
+        # Average every segment (including a shorter trailing one) in one pass
+        starts = np.arange(0, chroma.shape[1], segment_length)
+        if len(starts) == 0:
+            return progression
+        lengths = np.diff(np.append(starts, chroma.shape[1]))
+        segment_chroma = np.add.reduceat(chroma, starts, axis=1)
+        segment_chroma /= lengths
+        
+        # Score all templates against all segments in one call; confidences
+        # reduce over the same (12, n_segments) buffer while it is hot
+        best_ids = self._best_chord_ids(segment_chroma).tolist()
+        confidences = self._calculate_chord_confidence(segment_chroma).tolist()
+        timestamps = (starts / frames_per_second).tolist()
+        
+        # Assemble the result in one pass over plain Python values
+        for chord_id, timestamp, confidence in zip(best_ids, timestamps, confidences):
             progression.append({
-                'chord': chord,
+                'chord': self._chord_names[chord_id],
                 'timestamp': timestamp,
-                'confidence': self._calculate_chord_confidence(avg_chroma, chord)
+                'confidence': confidence
             })
         
         return progression
     
     def _match_chord(self, chroma: np.ndarray) -> str:
         """Match chroma vector to closest chord."""
-        best_chord = 'C'
-        best_score = -1
-        
-        for root_idx, root in enumerate(self.NOTES):
-            for chord_type, intervals in self.CHORD_INTERVALS.items():
-                # Create chord template
-                template = np.zeros(12)
-                for interval in intervals:
-                    template[(root_idx + interval) % 12] = 1
-                
-                # Calculate correlation
-                score = np.corrcoef(chroma, template)[0, 1]
-                if not np.isnan(score) and score > best_score:
-                    best_score = score
-                    best_chord = f"{root}{chord_type if chord_type != 'major' else ''}"
+        if NUMBA_AVAILABLE:
+            # Single vector: the fused kernel skips the (12, 1) reshape and
+            # the output buffer of the batched scorer
+            best, _ = _corr_argmax(np.ascontiguousarray(chroma, dtype=np.float32), self._template_unit)
+            return self._chord_names[best]
+        return self._chord_names[self._best_chord_ids(chroma[:, None])[0]]
+    
+    def _best_chord_ids(self, segment_chroma: np.ndarray) -> np.ndarray:
+        """
+        Index of the best-correlated chord template for each chroma column.
         
-        return best_chord
+        A flat chroma has no correlation with anything and falls back to the
+        first template (C).
+        """
+        # Contiguous float32 keeps the template product on the SGEMM fast
+        # path; a no-op for librosa output, a copy for transposed callers
+        segment_chroma = np.ascontiguousarray(segment_chroma, dtype=np.float32)
+        if NUMBA_AVAILABLE:
+            best_ids = np.empty(segment_chroma.shape[1], dtype=np.int64)
+            _score_chords(segment_chroma, self._template_unit, best_ids)
+            return best_ids
+        
+        # Correlation of all templates against all columns at once; a
+        # column's norm scales all its scores equally, so the argmax against
+        # unit templates does not need it
+        centered = segment_chroma - segment_chroma.mean(axis=0)
+        scores = self._template_unit @ centered
+        return scores.argmax(axis=0)
     
-    def _calculate_chord_confidence(self, chroma: np.ndarray, chord: str) -> float:
-        """Calculate confidence score for chord detection."""
+    def _calculate_chord_confidence(self, segment_chroma: np.ndarray) -> np.ndarray:
+        """Calculate confidence scores for every chroma column."""
         # This is a simplified confidence calculation
-        return min(1.0, max(0.0, np.max(chroma) * 0.8))
+        return np.clip(segment_chroma.max(axis=0) * 0.8, 0.0, 1.0)
     
     def get_chord_substitutions(self, chord: str, instrument: str, 
                               skill_level: int = 1) -> List[Dict]:
         """
         Get chord substitutions suitable for beginners or specific skill levels.
         """
+        subs = self._substitution_table.get((chord, instrument, skill_level))
+        if subs is None:
+            subs = self._cached_chord_substitutions(chord, instrument, skill_level)
+        return [dict(sub) for sub in subs]
+    
+    def get_chord_substitutions_batch(self, chords: List[str], instrument: str,
+                                      skill_level: int = 1) -> Dict[str, List[Dict]]:
+        """
+        Get substitutions for every distinct chord of a progression.
+        
+        Repeated chords are looked up once; the result maps each distinct
+        chord name to the same list get_chord_substitutions would return.
+        """
+        return {chord: self.get_chord_substitutions(chord, instrument, skill_level)
+                for chord in dict.fromkeys(chords)}
+    
+    @classmethod
+    @functools.lru_cache(maxsize=2048)
+    def _cached_chord_substitutions(cls, chord: str, instrument: str,
+                                    skill_level: int) -> Tuple[Tuple[Tuple[str, Any], ...], ...]:
+        """
+        Compute substitutions for get_chord_substitutions as frozen dict items.
+        
+        The result depends only on the arguments and class-level tables, so
+        it is memoized; callers rebuild fresh dicts from the item tuples.
+        """
         substitutions = []
         
         # Get instrument-specific substitutions
-        if instrument in self.BEGINNER_SUBSTITUTIONS:
-            if chord in self.BEGINNER_SUBSTITUTIONS[instrument]:
-                for sub_chord in self.BEGINNER_SUBSTITUTIONS[instrument][chord]:
-                    difficulty = self.CHORD_DIFFICULTY.get(instrument, {}).get(sub_chord, 3)
+        if instrument in cls.BEGINNER_SUBSTITUTIONS:
+            if chord in cls.BEGINNER_SUBSTITUTIONS[instrument]:
+                for sub_chord in cls.BEGINNER_SUBSTITUTIONS[instrument][chord]:
+                    difficulty = cls.CHORD_DIFFICULTY.get(instrument, {}).get(sub_chord, 3)
                     if difficulty <= skill_level + 1:  # Allow slightly harder chords
                         substitutions.append({
                             'chord': sub_chord,
@@ -751,9 +1246,9 @@ class EnhancedMusicTheoryEngine:
                         })
         
         # Add theoretical substitutions based on music theory
-        theoretical_subs = self._get_theoretical_substitutions(chord)
+        theoretical_subs = cls._get_theoretical_substitutions(chord)
         for sub in theoretical_subs:
-            difficulty = self.CHORD_DIFFICULTY.get(instrument, {}).get(sub['chord'], 3)
+            difficulty = cls.CHORD_DIFFICULTY.get(instrument, {}).get(sub['chord'], 3)
             if difficulty <= skill_level + 2:
                 substitutions.append({
                     **sub,
@@ -762,25 +1257,26 @@ class EnhancedMusicTheoryEngine:
         
         # Sort by difficulty and confidence
         substitutions.sort(key=lambda x: (x['difficulty'], -x['confidence']))
-        return substitutions[:5]  # Return top 5 substitutions
+        return tuple(tuple(sub.items()) for sub in substitutions[:5])  # Return top 5 substitutions
     
-    def _get_theoretical_substitutions(self, chord: str) -> List[Dict]:
+    @classmethod
+    def _get_theoretical_substitutions(cls, chord: str) -> List[Dict]:
         """Get chord substitutions based on music theory."""
         substitutions = []
         
         # Parse chord
-        root, chord_type = self._parse_chord(chord)
+        root, chord_type = cls._parse_chord(chord)
         if not root:
             return substitutions
         
-        root_idx = self.NOTES.index(root) if root in self.NOTES else 0
+        root_idx = cls._NOTE_IDX.get(root, 0)
         
         # Common substitutions
         if chord_type == 'major' or chord_type == '':
             # Relative minor
             rel_minor_idx = (root_idx - 3) % 12
             substitutions.append({
-                'chord': f"{self.NOTES[rel_minor_idx]}m",
+                'chord': f"{cls.NOTES[rel_minor_idx]}m",
                 'reason': "Relative minor",
                 'confidence': 0.7
             })
@@ -788,7 +1284,7 @@ class EnhancedMusicTheoryEngine:
             # vi chord (relative minor)
             vi_idx = (root_idx + 9) % 12
             substitutions.append({
-                'chord': f"{self.NOTES[vi_idx]}m",
+                'chord': f"{cls.NOTES[vi_idx]}m",
                 'reason': "vi chord substitution",
                 'confidence': 0.6
             })
@@ -797,151 +1293,125 @@ class EnhancedMusicTheoryEngine:
             # Relative major
             rel_major_idx = (root_idx + 3) % 12
             substitutions.append({
-                'chord': self.NOTES[rel_major_idx],
+                'chord': cls.NOTES[rel_major_idx],
                 'reason': "Relative major",
                 'confidence': 0.7
             })
         
         return substitutions
     
-    def _parse_chord(self, chord: str) -> Tuple[Optional[str], str]:
+    @classmethod
+    @functools.lru_cache(maxsize=512)
+    def _parse_chord(cls, chord: str) -> Tuple[Optional[str], str]:
         """Parse chord name into root note and chord type."""
         if not chord:
             return None, ''
         
-        # Handle sharp notes
-        if len(chord) > 1 and chord[1] == '#':
-            root = chord[:2]
-            chord_type = chord[2:]
-        else:
-            root = chord[0]
-            chord_type = chord[1:]
+        match = _CHORD_RE.match(chord)
+        if not match:
+            return None, ''
+        root, chord_type = match.groups()
         
         # Normalize chord type
-        if chord_type == '' or chord_type.lower() == 'maj':
-            chord_type = 'major'
-        elif chord_type.lower() == 'm' or chord_type.lower() == 'min':
-            chord_type = 'minor'
+        chord_type = _CHORD_TYPE_ALIASES.get(chord_type.lower(), chord_type)
         
-        return root if root in self.NOTES else None, chord_type
+        return root if root in cls._NOTE_IDX else None, chord_type
     
     def generate_chord_progression(self, key: str, style: str = 'pop') -> List[str]:
         """Generate a chord progression in a given key and style."""
-        progressions = {
-            'pop': ['I', 'V', 'vi', 'IV'],
-            'folk': ['I', 'IV', 'V', 'I'],
-            'blues': ['I', 'I', 'I', 'I', 'IV', 'IV', 'I', 'I', 'V', 'IV', 'I', 'V'],
-            'jazz': ['I', 'vi', 'ii', 'V'],
-            'rock': ['I', 'bVII', 'IV', 'I']
-        }
-        
-        if style not in progressions:
+        return list(self._cached_chord_progression(key, style))
+    
+    @classmethod
+    @functools.lru_cache(maxsize=512)
+    def _cached_chord_progression(cls, key: str, style: str) -> Tuple[str, ...]:
+        """Memoized body of generate_chord_progression, returned as a tuple."""
+        if style not in cls.STYLE_PROGRESSIONS:
             style = 'pop'
         
-        # Convert Roman numerals to actual chords
+        # Convert pre-resolved Roman numerals to actual chords
         root, mode = key.split() if ' ' in key else (key, 'major')
-        root_idx = self.NOTES.index(root) if root in self.NOTES else 0
-        
-        scale_degrees = {
-            'I': 0, 'ii': 2, 'iii': 4, 'IV': 5, 'V': 7, 'vi': 9, 'vii': 11,
-            'bVII': 10
-        }
+        root_idx = cls._NOTE_IDX.get(root, 0)
+        minor_col = 1 if mode == 'major' else 2
         
-        chord_progression = []
-        for numeral in progressions[style]:
-            if numeral in scale_degrees:
-                chord_idx = (root_idx + scale_degrees[numeral]) % 12
-                chord_root = self.NOTES[chord_idx]
-                
-                # Determine if chord should be major or minor based on key and degree
-                if mode == 'major':
-                    if numeral.lower() in ['ii', 'iii', 'vi']:
-                        chord_progression.append(f"{chord_root}m")
-                    else:
-                        chord_progression.append(chord_root)
-                else:  # minor key
-                    if numeral.upper() in ['III', 'VI', 'VII']:
-                        chord_progression.append(chord_root)
-                    else:
-                        chord_progression.append(f"{chord_root}m")
-        
-        return chord_progression
+        return tuple(
+            cls.NOTES[(root_idx + chord[0]) % 12] + ('m' if chord[minor_col] else '')
+            for chord in cls.STYLE_PROGRESSIONS[style]
+        )
     
     def get_learning_path(self, instrument: str, skill_level: int = 1) -> Dict:
         """Generate a learning path for an instrument based on skill level."""
-        paths = {
-            'guitar': {
-                1: {
-                    'name': 'Beginner Guitar Essentials',
-                    'chords': ['Em', 'Am', 'C', 'D', 'G'],
-                    'songs': ['Wonderwall - Oasis', 'Horse with No Name - America'],
-                    'techniques': ['Basic strumming', 'Chord transitions'],
-                    'estimated_weeks': 8
-                },
-                2: {
-                    'name': 'Intermediate Guitar Skills',
-                    'chords': ['F', 'Bm', 'A', 'E', 'Dm'],
-                    'songs': ['Blackbird - Beatles', 'Tears in Heaven - Clapton'],
-                    'techniques': ['Barre chords', 'Fingerpicking basics'],
-                    'estimated_weeks': 12
-                }
-            },
-            'piano': {
-                1: {
-                    'name': 'Piano Fundamentals',
-                    'chords': ['C', 'F', 'G', 'Am', 'Dm'],
-                    'songs': ['Twinkle Twinkle Little Star', 'Mary Had a Little Lamb'],
-                    'techniques': ['Proper posture', 'Basic scales', 'Simple melodies'],
-                    'estimated_weeks': 10
-                },
-                2: {
-                    'name': 'Intermediate Piano',
-                    'chords': ['A', 'D', 'E', 'Bm', 'Em'],
-                    'songs': ['Für Elise - Beethoven', 'Imagine - John Lennon'],
-                    'techniques': ['Chord inversions', 'Basic accompaniment patterns'],
-                    'estimated_weeks': 16
-                }
-            }
-        }
-        
-        return paths.get(instrument, {}).get(skill_level, {})
+        return dict(self.LEARNING_PATHS.get(instrument, {}).get(skill_level, {}))
+
+
+@functools.lru_cache(maxsize=None)
+def get_theory_engine() -> EnhancedMusicTheoryEngine:
+    """
+    Shared engine instance for request handlers.
+    
+    The engine keeps no per-request state, so one instance serves every
+    caller. The audio analysis cache lives on the class
+    (_cached_audio_harmony), so every instance shares it whether or not
+    it came from here.
+    """
+    return EnhancedMusicTheoryEngine()
 
 
 class PitchDetector:
     """Real-time pitch detection for tuning and practice feedback."""
     
+    NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+    
+    # Equal temperament reference: A4 = 440 Hz, 57 semitones above C0
+    A4_FREQUENCY = 440.0
+    A4_SEMITONES = 57
+    
+    # Notes are tracked over octaves 0-8
+    N_NOTES = 9 * 12
+    
+    # Below this confidence a buffer is reported as unpitched
+    MIN_CONFIDENCE = 0.5
+    
     def __init__(self, sample_rate: int = 22050):
         self.sample_rate = sample_rate
         self.note_frequencies = self._generate_note_frequencies()
+        
+        # Ascending frequency table with parallel names for batched lookups
+        self._names = list(self.note_frequencies)
+        self._freqs = np.array(list(self.note_frequencies.values()), dtype=np.float32)
+        
+        # Shortest lag of a tracked note; shorter peaks (silence, DC, hiss)
+        # would read as frequencies above B8
+        self._min_lag = sample_rate / self.note_frequencies[self._names[-1]]
     
     def _generate_note_frequencies(self) -> Dict[str, float]:
         """Generate frequencies for musical notes."""
-        A4_freq = 440.0
-        notes = {}
-        
-        for octave in range(0, 9):
-            for i, note in enumerate(['C', 'C#', 'D', 'D#', 'E', 'F', 
-                                    'F#', 'G', 'G#', 'A', 'A#', 'B']):
-                # Calculate frequency using equal temperament
-                semitones_from_A4 = (octave - 4) * 12 + (i - 9)
-                frequency = A4_freq * (2 ** (semitones_from_A4 / 12))
-                notes[f"{note}{octave}"] = frequency
-        
-        return notes
+        # Calculate all frequencies at once using equal temperament
+        semitones_from_A4 = np.arange(self.N_NOTES) - self.A4_SEMITONES
+        frequencies = self.A4_FREQUENCY * np.exp2(semitones_from_A4 / 12)
+        names = [f"{note}{octave}" for octave in range(9) for note in self.NOTE_NAMES]
+        return dict(zip(names, frequencies.tolist()))
     
     def detect_pitch(self, audio_buffer: np.ndarray) -> Dict:
         """Detect pitch from audio buffer."""
-        # Use autocorrelation for pitch detection
-        correlation = np.correlate(audio_buffer, audio_buffer, mode='full')
-        correlation = correlation[len(correlation)//2:]
+        # Use autocorrelation for pitch detection. Only the non-negative lags
+        # 0..N-1 are needed, so the power spectrum of the buffer zero-padded
+        # past 2N-1 gives them directly in O(N log N) without wrap-around
+        n = len(audio_buffer)
+        if n == 0:
+            return {'frequency': 0, 'note': 'Unknown', 'cents_off': 0, 'confidence': 0.0}
+        n_fft = next_fast_len(2 * n - 1, real=True)
+        spectrum = np.fft.rfft(audio_buffer, n_fft)
+        correlation = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n_fft)[:n]
         
         # Find the peak that corresponds to the fundamental frequency
-        d = np.diff(correlation)
-        start = np.where(d > 0)[0][0] if len(np.where(d > 0)[0]) > 0 else 1
-        peak = np.argmax(correlation[start:]) + start
+        peak = int(_autocorr_peak(correlation))
+        lag = _parabolic_lag(correlation, peak)
+        confidence = self._calculate_pitch_confidence(correlation, peak)
+        if lag < self._min_lag or confidence < self.MIN_CONFIDENCE:
+            return {'frequency': 0, 'note': 'Unknown', 'cents_off': 0, 'confidence': confidence}
         
-        # Convert to frequency
-        frequency = self.sample_rate / peak if peak > 0 else 0
+        # Convert to frequency, using the lag interpolated between samples
+        frequency = self.sample_rate / lag
         
         # Find closest note
         closest_note, cents_off = self._frequency_to_note(frequency)
@@ -950,7 +1420,7 @@ class PitchDetector:
             'frequency': frequency,
             'note': closest_note,
             'cents_off': cents_off,
-            'confidence': self._calculate_pitch_confidence(correlation, peak)
+            'confidence': confidence
         }
     
     def _frequency_to_note(self, frequency: float) -> Tuple[str, float]:
@@ -958,25 +1428,48 @@ class PitchDetector:
         if frequency <= 0:
             return 'Unknown', 0
         
-        # Find the closest note
-        min_diff = float('inf')
-        closest_note = 'Unknown'
+        # Equal temperament is analytic, so the closest note is the rounded
+        # semitone distance from C0, clamped to the tracked octaves. Scalar
+        # math avoids the numpy ufunc overhead on this per-buffer path
+        semitones_exact = 12 * math.log2(frequency / self.A4_FREQUENCY) + self.A4_SEMITONES
+        semitones = min(max(round(semitones_exact), 0), self.N_NOTES - 1)
+        closest_note = self._names[semitones]
         
-        for note, note_freq in self.note_frequencies.items():
-            diff = abs(frequency - note_freq)
-            if diff < min_diff:
-                min_diff = diff
-                closest_note = note
-        
-        # Calculate cents offset
-        if closest_note != 'Unknown':
-            note_freq = self.note_frequencies[closest_note]
-            cents_off = 1200 * np.log2(frequency / note_freq)
-        else:
-            cents_off = 0
+        # Distance to the chosen note in cents (100 cents per semitone)
+        cents_off = (semitones_exact - semitones) * 100
         
         return closest_note, cents_off
     
+    def detect_pitches_batch(self, frequencies: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        """
+        Convert an array of frequencies to nearest notes and cents offsets.
+        
+        Vectorized counterpart of _frequency_to_note: a binary search finds
+        the two bracketing notes and the one closer in cents is kept.
+        
+        Args:
+            frequencies: Frequencies in Hz; non-positive entries are 'Unknown'
+            
+        Returns:
+            Tuple of (note names, cents offsets)
+        """
+        frequencies = np.asarray(frequencies, dtype=np.float64)
+        valid = frequencies > 0
+        safe = np.where(valid, frequencies, 1.0)
+        
+        upper = np.clip(np.searchsorted(self._freqs, safe), 1, len(self._freqs) - 1)
+        lower = upper - 1
+        lower_freq = self._freqs[lower].astype(np.float64)
+        upper_freq = self._freqs[upper].astype(np.float64)
+        
+        # Below the geometric mean of the bracketing notes the lower one is closer in cents
+        nearest = np.where(safe * safe < lower_freq * upper_freq, lower, upper)
+        nearest_freq = np.where(nearest == lower, lower_freq, upper_freq)
+        
+        cents_off = np.where(valid, 1200 * np.log2(safe / nearest_freq), 0.0)
+        names = [self._names[i] if ok else 'Unknown' for i, ok in zip(nearest, valid)]
+        return names, cents_off
+    
     def _calculate_pitch_confidence(self, correlation: np.ndarray, peak: int) -> float:
         """Calculate confidence in pitch detection."""
         if peak == 0 or len(correlation) == 0:
@@ -990,6 +1483,12 @@ class PitchDetector:
         return max(0.0, confidence)
 
 
+@functools.lru_cache(maxsize=None)
+def get_pitch_detector() -> PitchDetector:
+    """Shared default-rate PitchDetector; detection keeps no state between buffers."""
+    return PitchDetector()
+
+
 class MetronomeEngine:
     """Digital metronome with various time signatures and sounds."""
     
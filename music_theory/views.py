@@ -7,23 +7,58 @@ from django.http import JsonResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from django.db.models import Max, Sum
 import json
 import os
+import shutil
 import tempfile
 import random
 import time
+from contextlib import contextmanager
+
+import numpy as np
 
 from .models import (
     Instrument, Chord, ChordProgression, InstrumentChord, 
     Song, UserProgress, LearningPath, Practice
 )
-from .theory_engine import EnhancedMusicTheoryEngine, PitchDetector, MetronomeEngine
+from .theory_engine import (
+    EnhancedMusicTheoryEngine, MetronomeEngine, PitchDetector,
+    get_pitch_detector, get_theory_engine
+)
 from .serializers import (
     InstrumentSerializer, ChordSerializer, SongSerializer,
     UserProgressSerializer, LearningPathSerializer
 )
 
 
+@contextmanager
+def _uploaded_audio_path(audio_file):
+    """
+    Yield a filesystem path holding the uploaded audio.
+    
+    Uploads Django already spooled to disk are analyzed in place; in-memory
+    ones are streamed to a temporary file in fixed-size blocks, which is
+    removed on exit. Analyze the path with persist=False so no feature
+    sidecar is left next to it.
+    """
+    owned = not hasattr(audio_file, 'temporary_file_path')
+    if owned:
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
+        temp_path = temp_file.name
+    else:
+        temp_path = audio_file.temporary_file_path()
+    
+    try:
+        if owned:
+            with temp_file:
+                shutil.copyfileobj(audio_file, temp_file, length=8 * 1024 * 1024)
+        yield temp_path
+    finally:
+        if owned and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
 class InstrumentViewSet(viewsets.ModelViewSet):
     queryset = Instrument.objects.all()
     serializer_class = InstrumentSerializer
@@ -35,7 +70,7 @@ class InstrumentViewSet(viewsets.ModelViewSet):
         instrument = self.get_object()
         skill_level = int(request.query_params.get('skill_level', 1))
         
-        theory_engine = EnhancedMusicTheoryEngine()
+        theory_engine = get_theory_engine()
         path = theory_engine.get_learning_path(instrument.name.lower(), skill_level)
         
         return Response(path)
@@ -46,7 +81,11 @@ class InstrumentViewSet(viewsets.ModelViewSet):
         instrument = self.get_object()
         difficulty = request.query_params.get('difficulty')
         
-        queryset = InstrumentChord.objects.filter(instrument=instrument)
+        # Join the chord names in and load only the fields used below
+        queryset = InstrumentChord.objects.filter(instrument=instrument).select_related('chord').only(
+            'chord__name', 'difficulty_level', 'fingering', 'alternative_fingerings',
+            'audio_sample', 'diagram_image'
+        )
         if difficulty:
             queryset = queryset.filter(difficulty_level__lte=int(difficulty))
         
@@ -76,7 +115,7 @@ class ChordViewSet(viewsets.ModelViewSet):
         instrument = request.query_params.get('instrument', 'guitar')
         skill_level = int(request.query_params.get('skill_level', 1))
         
-        theory_engine = EnhancedMusicTheoryEngine()
+        theory_engine = get_theory_engine()
         substitutions = theory_engine.get_chord_substitutions(
             chord.name, instrument, skill_level
         )
@@ -85,7 +124,7 @@ class ChordViewSet(viewsets.ModelViewSet):
 
 
 class SongViewSet(viewsets.ModelViewSet):
-    queryset = Song.objects.all()
+    queryset = SongSerializer.setup_eager_loading(Song.objects.all())
     serializer_class = SongSerializer
     permission_classes = [IsAuthenticated]
     
@@ -100,24 +139,14 @@ class SongViewSet(viewsets.ModelViewSet):
         
         audio_file = request.FILES['audio_file']
         
-        # Save file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-            for chunk in audio_file.chunks():
-                temp_file.write(chunk)
-            temp_path = temp_file.name
-        
         try:
-            theory_engine = EnhancedMusicTheoryEngine()
-            analysis = theory_engine.analyze_audio_harmony(temp_path)
-            
-            # Clean up temp file
-            os.unlink(temp_path)
+            # Analyze the upload from disk; the temp file is cleaned up on exit
+            with _uploaded_audio_path(audio_file) as temp_path:
+                theory_engine = get_theory_engine()
+                analysis = theory_engine.analyze_audio_harmony(temp_path, persist=False)
             
             return Response(analysis)
         except Exception as e:
-            # Clean up temp file on error
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
             return Response(
                 {'error': str(e)}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -130,7 +159,7 @@ class SongViewSet(viewsets.ModelViewSet):
         instrument = request.query_params.get('instrument', 'guitar')
         skill_level = int(request.query_params.get('skill_level', 1))
         
-        theory_engine = EnhancedMusicTheoryEngine()
+        theory_engine = get_theory_engine()
         
         # Get original chord progression
         if song.chord_progression and song.chord_progression.chords:
@@ -150,11 +179,12 @@ class SongViewSet(viewsets.ModelViewSet):
             'beginner_adaptations': []
         }
         
-        # Get substitutions for each chord
+        # Get substitutions for each distinct chord once
+        chord_substitutions = theory_engine.get_chord_substitutions_batch(
+            original_chords, instrument, skill_level
+        )
         for chord in original_chords:
-            substitutions = theory_engine.get_chord_substitutions(
-                chord, instrument, skill_level
-            )
+            substitutions = chord_substitutions[chord]
             
             beginner_version['beginner_adaptations'].append({
                 'original_chord': chord,
@@ -170,7 +200,9 @@ class PracticeViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Practice.objects.filter(user=self.request.user)
+        return self.serializer_class.setup_eager_loading(
+            Practice.objects.filter(user=self.request.user)
+        )
     
     @action(detail=False, methods=['post'])
     def start_session(self, request):
@@ -204,15 +236,42 @@ class PracticeViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def pitch_feedback(self, request):
         """Provide real-time pitch feedback."""
-        # This would typically receive audio data from the frontend
-        # For now, return mock data
-        
-        pitch_detector = PitchDetector()
+        target_note = request.data.get('target_note', 'A4')
+        
+        # The frontend posts one frame of mono 16-bit PCM as 'audio'
+        audio = request.FILES.get('audio')
+        if audio is not None:
+            pitch_detector = get_pitch_detector()
+            try:
+                sample_rate = int(request.data.get('sample_rate', pitch_detector.sample_rate))
+            except (TypeError, ValueError):
+                sample_rate = 0
+            if sample_rate <= 0:
+                return Response(
+                    {'error': 'sample_rate must be a positive integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if sample_rate != pitch_detector.sample_rate:
+                pitch_detector = PitchDetector(sample_rate)
+            
+            data = audio.read()
+            samples = np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16)
+            pitch = pitch_detector.detect_pitch(samples.astype(np.float32) / 32768.0)
+            
+            cents_off = float(pitch['cents_off'])
+            return Response({
+                'detected_note': pitch['note'],
+                'target_note': target_note,
+                'frequency': float(pitch['frequency']),
+                'cents_off': cents_off,
+                'in_tune': pitch['note'] == target_note and abs(cents_off) <= 10,
+                'confidence': float(pitch['confidence'])
+            })
         
-        # In a real implementation, you'd process the audio buffer here
+        # Without audio, return mock data
         feedback = {
             'detected_note': 'A4',
-            'target_note': request.data.get('target_note', 'A4'),
+            'target_note': target_note,
             'cents_off': 5,  # How many cents off the target
             'in_tune': True,
             'confidence': 0.85
@@ -251,7 +310,7 @@ class ChordRecommendationView(View):
             instrument = data.get('instrument', 'guitar')
             skill_level = int(data.get('skill_level', 1))
             
-            theory_engine = EnhancedMusicTheoryEngine()
+            theory_engine = get_theory_engine()
             recommendations = theory_engine.get_chord_substitutions(
                 chord, instrument, skill_level
             )
@@ -282,16 +341,9 @@ class KeyDetectionView(View):
             audio_file = request.FILES['audio_file']
             
             # Process audio file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-                for chunk in audio_file.chunks():
-                    temp_file.write(chunk)
-                temp_path = temp_file.name
-            
-            theory_engine = EnhancedMusicTheoryEngine()
-            analysis = theory_engine.analyze_audio_harmony(temp_path)
-            
-            # Clean up
-            os.unlink(temp_path)
+            with _uploaded_audio_path(audio_file) as temp_path:
+                theory_engine = get_theory_engine()
+                analysis = theory_engine.analyze_audio_harmony(temp_path, persist=False)
             
             return JsonResponse({
                 'success': True,
@@ -308,35 +360,35 @@ class ProgressTrackingView(View):
     """Track user progress across different instruments and songs."""
     
     def get(self, request):
-        progress = UserProgress.objects.filter(user=request.user)
+        # One grouped row per instrument; the composite unique index on
+        # (user, instrument, ...) covers the filter and grouping
+        instruments = UserProgress.objects.filter(user=request.user).values(
+            'instrument__name'
+        ).annotate(
+            total_time=Sum('practice_time'),
+            max_skill_level=Max('skill_level'),
+            max_mastery=Max('mastery_percentage')
+        ).order_by('instrument__name')
         
         progress_data = {
-            'total_practice_time': sum(p.practice_time.total_seconds() for p in progress),
-            'instruments': {},
+            'total_practice_time': sum(row['total_time'].total_seconds() for row in instruments),
+            'instruments': {
+                row['instrument__name']: {
+                    'skill_level': row['max_skill_level'],
+                    'mastery_percentage': max(row['max_mastery'], 0),
+                    'songs_learned': 0,
+                    'chords_mastered': 0
+                } for row in instruments
+            },
             'achievements': [],
             'current_level': 1
         }
         
-        for p in progress:
-            instrument_name = p.instrument.name
-            if instrument_name not in progress_data['instruments']:
-                progress_data['instruments'][instrument_name] = {
-                    'skill_level': p.skill_level,
-                    'mastery_percentage': 0,
-                    'songs_learned': 0,
-                    'chords_mastered': 0
-                }
-            
-            progress_data['instruments'][instrument_name]['mastery_percentage'] = max(
-                progress_data['instruments'][instrument_name]['mastery_percentage'],
-                p.mastery_percentage
-            )
-        
         return JsonResponse(progress_data)
 
 
 class LearningPathViewSet(viewsets.ModelViewSet):
-    queryset = LearningPath.objects.all()
+    queryset = LearningPathSerializer.setup_eager_loading(LearningPath.objects.all())
     serializer_class = LearningPathSerializer
     permission_classes = [IsAuthenticated]
     
@@ -345,22 +397,27 @@ class LearningPathViewSet(viewsets.ModelViewSet):
         """Enroll user in a learning path."""
         learning_path = self.get_object()
         
-        # Create progress entries for all songs and chords in the path
-        for song in learning_path.songs.all():
-            UserProgress.objects.get_or_create(
-                user=request.user,
-                instrument=learning_path.instrument,
-                song=song,
-                defaults={'skill_level': 1, 'mastery_percentage': 0.0}
-            )
-        
-        for chord in learning_path.chords.all():
-            UserProgress.objects.get_or_create(
-                user=request.user,
-                instrument=learning_path.instrument,
-                chord=chord,
-                defaults={'skill_level': 1, 'mastery_percentage': 0.0}
-            )
+        # Create progress entries for all songs and chords in the path. The
+        # unique constraint cannot catch duplicates (NULL song or chord
+        # columns never conflict), so existing entries are read in one query
+        # and only the missing ones are inserted in bulk
+        existing = list(UserProgress.objects.filter(
+            user=request.user,
+            instrument=learning_path.instrument
+        ).values_list('song_id', 'chord_id'))
+        existing_songs = {song_id for song_id, _ in existing}
+        existing_chords = {chord_id for _, chord_id in existing}
+        
+        new_entries = [
+            UserProgress(user=request.user, instrument=learning_path.instrument,
+                         song=song, skill_level=1, mastery_percentage=0.0)
+            for song in learning_path.songs.all() if song.pk not in existing_songs
+        ] + [
+            UserProgress(user=request.user, instrument=learning_path.instrument,
+                         chord=chord, skill_level=1, mastery_percentage=0.0)
+            for chord in learning_path.chords.all() if chord.pk not in existing_chords
+        ]
+        UserProgress.objects.bulk_create(new_entries, batch_size=500)
         
         return Response({'message': 'Successfully enrolled in learning path'})
     
@@ -369,17 +426,19 @@ class LearningPathViewSet(viewsets.ModelViewSet):
         """Get user's progress in this learning path."""
         learning_path = self.get_object()
         
+        # Join the song and chord names in and load only the fields reported
+        # below; both lists need every row, so each is one query
         song_progress = UserProgress.objects.filter(
             user=request.user,
             instrument=learning_path.instrument,
             song__in=learning_path.songs.all()
-        )
+        ).select_related('song').only('mastery_percentage', 'practice_time', 'song__title')
         
         chord_progress = UserProgress.objects.filter(
             user=request.user,
             instrument=learning_path.instrument,
             chord__in=learning_path.chords.all()
-        )
+        ).select_related('chord').only('mastery_percentage', 'practice_time', 'chord__name')
         
         total_items = learning_path.songs.count() + learning_path.chords.count()
         completed_items = sum(1 for p in song_progress if p.mastery_percentage >= 80) + \
@@ -431,40 +490,43 @@ def rhythm_training_view(request):
     """Rhythm training page view."""
     return render(request, 'music_theory/rhythm_training.html')
 
+# Exercise tables are constant, so they are built once at import
+_NOTE_INDEX = {note: idx for idx, note in enumerate(EnhancedMusicTheoryEngine.NOTES)}
+
+_INTERVAL_EXERCISES = [
+    {'name': 'Perfect Unison', 'semitones': 0, 'difficulty': 1},
+    {'name': 'Minor Second', 'semitones': 1, 'difficulty': 3},
+    {'name': 'Major Second', 'semitones': 2, 'difficulty': 2},
+    {'name': 'Minor Third', 'semitones': 3, 'difficulty': 2},
+    {'name': 'Major Third', 'semitones': 4, 'difficulty': 2},
+    {'name': 'Perfect Fourth', 'semitones': 5, 'difficulty': 1},
+    {'name': 'Tritone', 'semitones': 6, 'difficulty': 4},
+    {'name': 'Perfect Fifth', 'semitones': 7, 'difficulty': 1},
+    {'name': 'Minor Sixth', 'semitones': 8, 'difficulty': 3},
+    {'name': 'Major Sixth', 'semitones': 9, 'difficulty': 3},
+    {'name': 'Minor Seventh', 'semitones': 10, 'difficulty': 3},
+    {'name': 'Major Seventh', 'semitones': 11, 'difficulty': 4},
+    {'name': 'Perfect Octave', 'semitones': 12, 'difficulty': 1},
+]
+
 @api_view(['GET'])
 @csrf_exempt
 def generate_interval_exercise(request):
     """Generate a random interval exercise."""
-    intervals = [
-        {'name': 'Perfect Unison', 'semitones': 0, 'difficulty': 1},
-        {'name': 'Minor Second', 'semitones': 1, 'difficulty': 3},
-        {'name': 'Major Second', 'semitones': 2, 'difficulty': 2},
-        {'name': 'Minor Third', 'semitones': 3, 'difficulty': 2},
-        {'name': 'Major Third', 'semitones': 4, 'difficulty': 2},
-        {'name': 'Perfect Fourth', 'semitones': 5, 'difficulty': 1},
-        {'name': 'Tritone', 'semitones': 6, 'difficulty': 4},
-        {'name': 'Perfect Fifth', 'semitones': 7, 'difficulty': 1},
-        {'name': 'Minor Sixth', 'semitones': 8, 'difficulty': 3},
-        {'name': 'Major Sixth', 'semitones': 9, 'difficulty': 3},
-        {'name': 'Minor Seventh', 'semitones': 10, 'difficulty': 3},
-        {'name': 'Major Seventh', 'semitones': 11, 'difficulty': 4},
-        {'name': 'Perfect Octave', 'semitones': 12, 'difficulty': 1},
-    ]
-    
     difficulty = int(request.GET.get('difficulty', 2))
-    filtered_intervals = [i for i in intervals if i['difficulty'] <= difficulty]
+    filtered_intervals = [i for i in _INTERVAL_EXERCISES if i['difficulty'] <= difficulty]
     
     interval = random.choice(filtered_intervals)
-    root_note = random.choice(['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B'])
+    root_note = random.choice(EnhancedMusicTheoryEngine.NOTES)
     
     # Calculate MIDI note numbers (C4 = 60)
-    root_midi = 60 + ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B'].index(root_note)
+    root_midi = 60 + _NOTE_INDEX[root_note]
     interval_midi = root_midi + interval['semitones']
     
     # Create multiple choice options
     options = [interval['name']]
     while len(options) < 4:
-        random_interval = random.choice(intervals)
+        random_interval = random.choice(_INTERVAL_EXERCISES)
         if random_interval['name'] not in options:
             options.append(random_interval['name'])
     
@@ -481,25 +543,25 @@ def generate_interval_exercise(request):
         'exercise_id': int(time.time() * 1000)  # Unique ID
     })
 
+_SCALE_EXERCISES = {
+    'Major': [0, 2, 4, 5, 7, 9, 11],
+    'Natural Minor': [0, 2, 3, 5, 7, 8, 10],
+    'Harmonic Minor': [0, 2, 3, 5, 7, 8, 11],
+    'Melodic Minor': [0, 2, 3, 5, 7, 9, 11],
+    'Dorian': [0, 2, 3, 5, 7, 9, 10],
+    'Phrygian': [0, 1, 3, 5, 7, 8, 10],
+    'Lydian': [0, 2, 4, 6, 7, 9, 11],
+    'Mixolydian': [0, 2, 4, 5, 7, 9, 10],
+    'Locrian': [0, 1, 3, 5, 6, 8, 10],
+    'Pentatonic Major': [0, 2, 4, 7, 9],
+    'Pentatonic Minor': [0, 3, 5, 7, 10],
+    'Blues': [0, 3, 5, 6, 7, 10],
+}
+
 @api_view(['GET'])
 @csrf_exempt
 def generate_scale_exercise(request):
     """Generate a random scale exercise."""
-    scales = {
-        'Major': [0, 2, 4, 5, 7, 9, 11],
-        'Natural Minor': [0, 2, 3, 5, 7, 8, 10],
-        'Harmonic Minor': [0, 2, 3, 5, 7, 8, 11],
-        'Melodic Minor': [0, 2, 3, 5, 7, 9, 11],
-        'Dorian': [0, 2, 3, 5, 7, 9, 10],
-        'Phrygian': [0, 1, 3, 5, 7, 8, 10],
-        'Lydian': [0, 2, 4, 6, 7, 9, 11],
-        'Mixolydian': [0, 2, 4, 5, 7, 9, 10],
-        'Locrian': [0, 1, 3, 5, 6, 8, 10],
-        'Pentatonic Major': [0, 2, 4, 7, 9],
-        'Pentatonic Minor': [0, 3, 5, 7, 10],
-        'Blues': [0, 3, 5, 6, 7, 10],
-    }
-    
     difficulty = int(request.GET.get('difficulty', 1))
     
     if difficulty == 1:
@@ -507,15 +569,15 @@ def generate_scale_exercise(request):
     elif difficulty == 2:
         available_scales = ['Major', 'Natural Minor', 'Harmonic Minor', 'Dorian', 'Mixolydian', 'Pentatonic Major', 'Pentatonic Minor', 'Blues']
     else:
-        available_scales = list(scales.keys())
+        available_scales = list(_SCALE_EXERCISES.keys())
     
     scale_name = random.choice(available_scales)
-    scale_intervals = scales[scale_name]
+    scale_intervals = _SCALE_EXERCISES[scale_name]
     root_note = random.choice(['C', 'D', 'E', 'F', 'G', 'A', 'B'])
     
     # Calculate the scale notes
-    note_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
-    root_index = note_names.index(root_note)
+    note_names = EnhancedMusicTheoryEngine.NOTES
+    root_index = _NOTE_INDEX[root_note]
     
     scale_notes = []
     for interval in scale_intervals:
@@ -545,25 +607,25 @@ def generate_scale_exercise(request):
         'exercise_id': int(time.time() * 1000)
     })
 
+_RHYTHM_EXERCISES = {
+    'Whole Note': {'duration': 4, 'pattern': '◌', 'difficulty': 1},
+    'Half Notes': {'duration': 2, 'pattern': '♩ ♩', 'difficulty': 1},
+    'Quarter Notes': {'duration': 1, 'pattern': '♪ ♪ ♪ ♪', 'difficulty': 1},
+    'Eighth Notes': {'duration': 0.5, 'pattern': '♫ ♫ ♫ ♫', 'difficulty': 2},
+    'Mixed Quarter-Eighth': {'duration': [1, 0.5, 0.5, 1], 'pattern': '♪ ♫ ♪', 'difficulty': 2},
+    'Sixteenth Notes': {'duration': 0.25, 'pattern': '♬ ♬ ♬ ♬', 'difficulty': 3},
+    'Syncopated': {'duration': [0.5, 1, 0.5, 1], 'pattern': '♫ ♪ ♫ ♪', 'difficulty': 4},
+    'Triplets': {'duration': 1/3, 'pattern': '♪♪♪ ♪♪♪', 'difficulty': 4},
+}
+
 @api_view(['GET'])
 @csrf_exempt  
 def generate_rhythm_exercise(request):
     """Generate a random rhythm exercise."""
-    rhythms = {
-        'Whole Note': {'duration': 4, 'pattern': '◌', 'difficulty': 1},
-        'Half Notes': {'duration': 2, 'pattern': '♩ ♩', 'difficulty': 1},
-        'Quarter Notes': {'duration': 1, 'pattern': '♪ ♪ ♪ ♪', 'difficulty': 1},
-        'Eighth Notes': {'duration': 0.5, 'pattern': '♫ ♫ ♫ ♫', 'difficulty': 2},
-        'Mixed Quarter-Eighth': {'duration': [1, 0.5, 0.5, 1], 'pattern': '♪ ♫ ♪', 'difficulty': 2},
-        'Sixteenth Notes': {'duration': 0.25, 'pattern': '♬ ♬ ♬ ♬', 'difficulty': 3},
-        'Syncopated': {'duration': [0.5, 1, 0.5, 1], 'pattern': '♫ ♪ ♫ ♪', 'difficulty': 4},
-        'Triplets': {'duration': 1/3, 'pattern': '♪♪♪ ♪♪♪', 'difficulty': 4},
-    }
-    
     difficulty = int(request.GET.get('difficulty', 1))
     time_signature = request.GET.get('time_signature', '4/4')
     
-    filtered_rhythms = {k: v for k, v in rhythms.items() if v['difficulty'] <= difficulty}
+    filtered_rhythms = {k: v for k, v in _RHYTHM_EXERCISES.items() if v['difficulty'] <= difficulty}
     
     rhythm_name = random.choice(list(filtered_rhythms.keys()))
     rhythm_data = filtered_rhythms[rhythm_name]
@@ -574,7 +636,7 @@ def generate_rhythm_exercise(request):
     # Create multiple choice options
     options = [rhythm_name]
     while len(options) < 4:
-        random_rhythm = random.choice(list(rhythms.keys()))
+        random_rhythm = random.choice(list(_RHYTHM_EXERCISES.keys()))
         if random_rhythm not in options:
             options.append(random_rhythm)
     
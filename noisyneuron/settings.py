@@ -201,7 +201,7 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024  # 100MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024  # 5MB; larger uploads are streamed to temp files
 DATA_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024   # 100MB
 
 # Audio processing settings
@@ -367,5 +367,5 @@ EMAIL_HOST_PASSWORD = ''
 DEFAULT_FROM_EMAIL = 'noreply@noisyneuron.com'
 
 # File Upload Settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB; larger uploads are streamed to temp files
 DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB